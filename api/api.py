@@ -1,43 +1,82 @@
+import csv
+import io
+import itertools
+import json
 import os
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List
+import zlib
+from datetime import date
+from functools import lru_cache
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError, create_model
+from typing import Dict, List, Literal, Optional
 import psycopg2
+import psycopg2.errors
 import psycopg2.extras
 from dotenv import load_dotenv
 import uvicorn
 
+from api.db import ConnectionPool, PoolUnavailable
+
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL not set in .env")
 
-# Connexion à PostgreSQL
-conn = psycopg2.connect(DATABASE_URL)
-conn.autocommit = True
+# "sync" : psycopg2 + threadpool FastAPI ; "async" : psycopg 3 natif asyncio
+DB_MODE = os.getenv("DB_MODE", "sync")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Pool de connexions PostgreSQL (par worker uvicorn)
+pool = ConnectionPool(DATABASE_URL, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT)
+
+# Vue pré-agrégée absente (aggregates.py pas encore lancé) ou jamais remplie
+MISSING_VIEW_ERRORS = (psycopg2.errors.UndefinedTable, psycopg2.errors.ObjectNotInPrerequisiteState)
+
+async_pool = None
+if DB_MODE == "async":
+    import psycopg
+    from api.db_async import AsyncPool, PoolTimeout as AsyncPoolTimeout
+    async_pool = AsyncPool(DATABASE_URL, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT)
+    MISSING_VIEW_ERRORS += (psycopg.errors.UndefinedTable, psycopg.errors.ObjectNotInPrerequisiteState)
 
 app = FastAPI(title="API MSPR6.1 CRUD")
 
+@app.on_event("startup")
+async def open_pool():
+    if async_pool is not None:
+        await async_pool.open()
+
+@app.on_event("shutdown")
+async def close_pool():
+    if async_pool is not None:
+        await async_pool.close()
+    pool.close()
+
 
 class CovidItem(BaseModel):
     id: int
     country_region: str
-    date: str
+    date: date
     total_cases: float
     total_deaths: float
-    total_gueris: float
+    total_recovered: float
 
 class CovidCreate(BaseModel):
     country_region: str
     date: str
     total_cases: float
     total_deaths: float
-    total_gueris: float
+    total_recovered: float
 
 class MpoxItem(BaseModel):
     id: int
     country_region: str
-    date: str
+    date: date
     total_cases: float
     total_deaths: float
     total_recovered: float
@@ -49,70 +88,580 @@ class MpoxCreate(BaseModel):
     total_deaths: float
     total_recovered: float
 
+class BulkResult(BaseModel):
+    received: int
+    inserted: int
+    updated: int
+
+# -------------------------------
+# Colonnes exposées -> expressions SQL
+# -------------------------------
+# Les deux tables ont le schéma de backup_local.sql / store_data.py
+COVID_COLUMNS = {
+    "id":              "id",
+    "country_region":  "country_region",
+    "date":            "date",
+    "total_cases":     "total_cases",
+    "total_deaths":    "total_deaths",
+    "total_recovered": "total_recovered",
+}
+
+MPOX_COLUMNS = dict(COVID_COLUMNS)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+
 # -------------------------------
 # Helpers
 # -------------------------------
+def fetch_dicts(query: str, params=None, one: bool = False, retry: bool = False):
+    """
+    Exécute la requête sur le pool. Une lecture (`retry`) coupée par un
+    redémarrage de PostgreSQL est rejouée une fois ; sinon 503.
+    """
+    def work(conn):
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query, params or ())
+            return cur.fetchone() if one else cur.fetchall()
+    try:
+        return pool.run(work, retry=retry)
+    except PoolUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 def fetchall_dicts(query: str, params=None):
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(query, params or ())
-        return cur.fetchall()
+    return fetch_dicts(query, params, retry=True)
+
+def fetchone_dict(query: str, params=None, retry: bool = False):
+    """Une ligne ; pas de nouvel essai par défaut (INSERT / UPDATE / DELETE ... RETURNING)."""
+    return fetch_dicts(query, params, one=True, retry=retry)
+
+async def afetchall_dicts(query: str, params=None):
+    """Version awaitable : pool asynchrone en mode async, threadpool sinon."""
+    if async_pool is None:
+        return await run_in_threadpool(fetchall_dicts, query, params)
+    try:
+        return await async_pool.fetchall_dicts(query, params)
+    except AsyncPoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+async def afetchone_dict(query: str, params=None, retry: bool = False):
+    if async_pool is None:
+        return await run_in_threadpool(fetchone_dict, query, params, retry)
+    try:
+        return await async_pool.fetchone_dict(query, params)
+    except AsyncPoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+def parse_fields(fields: Optional[str], columns: Dict[str, str]) -> List[str]:
+    """
+    Transforme le paramètre `fields` (liste séparée par des virgules) en liste
+    de colonnes. `id` est toujours renvoyé car il sert de curseur de pagination.
+    """
+    if not fields:
+        return list(columns)
+    selected = ["id"]
+    for name in fields.split(","):
+        name = name.strip()
+        if not name or name in selected:
+            continue
+        if name not in columns:
+            raise HTTPException(status_code=400, detail=f"Champ inconnu : {name}")
+        selected.append(name)
+    return selected
+
+def build_select_query(table: str, columns: Dict[str, str], fields=None, countries=None,
+                       date_from=None, date_to=None, cursor=None):
+    """Construit le SELECT filtré et projeté, trié par `id`."""
+    selected = parse_fields(fields, columns)
+    select_list = ",\n            ".join(
+        name if columns[name] == name else f"{columns[name]} AS {name}" for name in selected
+    )
+
+    where, params = [], []
+    if countries:
+        where.append(f"{columns['country_region']} = ANY(%s)")
+        params.append(list(countries))
+    if date_from is not None:
+        where.append(f"{columns['date']} >= %s")
+        params.append(date_from)
+    if date_to is not None:
+        where.append(f"{columns['date']} <= %s")
+        params.append(date_to)
+    if cursor is not None:
+        where.append("id > %s")
+        params.append(cursor)
+
+    query = f"""
+        SELECT
+            {select_list}
+        FROM {table}
+    """
+    if where:
+        query += "    WHERE " + "\n          AND ".join(where) + "\n    "
+    query += "    ORDER BY id\n    "
+    return query, params
+
+def build_page_query(table: str, columns: Dict[str, str], fields=None, countries=None,
+                     date_from=None, date_to=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Construit la requête paginée (keyset sur `id`) avec filtres et projection.
+    On demande `limit + 1` lignes pour savoir s'il reste une page suivante.
+    """
+    query, params = build_select_query(table, columns, fields, countries, date_from, date_to, cursor)
+    query += "    LIMIT %s\n    "
+    params.append(limit + 1)
+    return query, params
+
+def build_aggregate_query(view: str, countries=None, date_from=None, date_to=None):
+    """
+    SELECT sur une vue pré-agrégée de scripts/aggregates.py (<table>_latest,
+    <table>_monthly, <table>_global_monthly), filtrée par pays et par mois.
+    """
+    where, params = [], []
+    if countries and not view.endswith("_global_monthly"):
+        where.append("country_region = ANY(%s)")
+        params.append(list(countries))
+    if view.endswith("_monthly"):
+        if date_from is not None:
+            where.append("month >= date_trunc('month', %s::date)")
+            params.append(date_from)
+        if date_to is not None:
+            where.append("month <= %s")
+            params.append(date_to)
+    query = f"SELECT * FROM {view}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    order = "country_region" if view.endswith("_latest") else (
+        "month" if view.endswith("_global_monthly") else "country_region, month")
+    return query + f" ORDER BY {order}", params
+
+SUMMARY_QUERY = """
+    SELECT count(*)                          AS countries,
+           max(date)                         AS last_date,
+           coalesce(sum(total_cases), 0)     AS total_cases,
+           coalesce(sum(total_deaths), 0)    AS total_deaths,
+           coalesce(sum(total_recovered), 0) AS total_recovered
+    FROM {view}
+"""
+
+async def fetch_view(fetch, view: str, query: str, params):
+    """Exécute `fetch` sur une vue pré-agrégée ; 503 si la vue n'existe pas encore."""
+    try:
+        return await fetch(query, params)
+    except MISSING_VIEW_ERRORS:
+        raise HTTPException(status_code=503, detail=f"Vue {view} absente : lancer scripts/aggregates.py")
+
+async def read_aggregate(view: str, countries=None, date_from=None, date_to=None):
+    query, params = build_aggregate_query(view, countries, date_from, date_to)
+    return await fetch_view(afetchall_dicts, view, query, params)
+
+async def read_summary(table: str, countries=None):
+    """Indicateurs clés (somme des dernières valeurs par pays) depuis <table>_latest."""
+    view = f"{table}_latest"
+    query, params = SUMMARY_QUERY.format(view=view), []
+    if countries:
+        query += " WHERE country_region = ANY(%s)"
+        params.append(list(countries))
+    return await fetch_view(lambda q, p: afetchone_dict(q, p, retry=True), view, query, params)
+
+def to_page(rows, limit: int):
+    """Découpe le résultat `limit + 1` en (lignes de la page, curseur suivant ou None)."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]["id"]
+    return rows, None
+
+@lru_cache(maxsize=None)
+def projection_model(model, fields: tuple):
+    """Modèle réduit aux colonnes projetées, avec les types de `model`."""
+    if list(fields) == list(model.__fields__):
+        return model
+    return create_model(
+        f"{model.__name__}Fields",
+        **{name: (model.__fields__[name].outer_type_, ...) for name in fields},
+    )
+
+def page_response(request: Request, rows, limit: int, model, columns: Dict[str, str], fields=None):
+    """
+    Liste des lignes de la page, validées par `model` (ou sa projection),
+    comme avant la pagination. Le curseur de la page suivante est renvoyé
+    dans les en-têtes X-Next-Cursor et Link (rel="next").
+    """
+    rows, next_cursor = to_page(rows, limit)
+    item_model = projection_model(model, tuple(parse_fields(fields, columns)))
+    items = [item_model.parse_obj(row) for row in rows]
+    headers = {}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    return JSONResponse(jsonable_encoder(items), headers=headers)
+
+# -------------------------------
+# Export en flux (NDJSON / CSV)
+# -------------------------------
+def iter_row_chunks(query: str, params=None, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Parcourt le résultat via un curseur nommé (côté serveur) : PostgreSQL
+    n'envoie que `chunk_size` lignes à la fois, la mémoire reste constante.
+    Une erreur après l'envoi des premières lignes est journalisée puis relancée :
+    le serveur coupe alors la connexion au lieu de terminer une réponse 200
+    tronquée.
+    """
+    sent = 0
+    try:
+        with pool.connection() as conn:
+            # Un curseur nommé doit vivre dans une transaction
+            conn.autocommit = False
+            try:
+                with conn.cursor(name="export", cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                    cur.itersize = chunk_size
+                    cur.execute(query, params or ())
+                    while True:
+                        rows = cur.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        yield rows
+                        sent += len(rows)
+            finally:
+                if not conn.closed:
+                    conn.rollback()
+                    conn.autocommit = True
+    except (psycopg2.Error, PoolUnavailable) as e:
+        if sent:
+            print(f"Export interrompu après {sent} lignes : {e}")
+        raise
+
+def encode_ndjson(chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in rows).encode()
+
+def encode_csv(chunks, fieldnames):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+def gzip_stream(blocks):
+    compressor = zlib.compressobj(wbits=31)  # 31 = en-tête gzip
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+async def stream_blocks(blocks, source):
+    """
+    Envoie les blocs depuis le threadpool. Quand le flux s'arrête (fin, erreur
+    ou déconnexion du client), ferme `source` : le curseur nommé est fermé et
+    la connexion rendue au pool sans attendre le ramasse-miettes.
+    """
+    try:
+        async for block in iterate_in_threadpool(blocks):
+            yield block
+    finally:
+        await run_in_threadpool(source.close)
 
-def fetchone_dict(query: str, params=None):
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(query, params or ())
-        return cur.fetchone()
+def export_response(table: str, columns: Dict[str, str], fmt: str, gzip: bool,
+                    fields=None, countries=None, date_from=None, date_to=None) -> StreamingResponse:
+    query, params = build_select_query(table, columns, fields, countries, date_from, date_to)
+    source = iter_row_chunks(query, params)
+    # On lit le premier lot ici : une erreur SQL ou de pool donne un vrai code
+    # HTTP au lieu d'une réponse 200 tronquée.
+    try:
+        first = next(source, [])
+    except PoolUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    chunks = itertools.chain([first], source)
+
+    if fmt == "csv":
+        body, media_type = encode_csv(chunks, parse_fields(fields, columns)), "text/csv"
+    else:
+        body, media_type = encode_ndjson(chunks), "application/x-ndjson"
+    filename = f"{table}.{fmt}"
+    if gzip:
+        body, media_type, filename = gzip_stream(body), "application/gzip", filename + ".gz"
+    return StreamingResponse(
+        stream_blocks(body, source),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# -------------------------------
+# Insertion en masse (COPY + upsert)
+# -------------------------------
+async def parse_bulk_body(request: Request, model) -> List[BaseModel]:
+    """
+    Lit le corps d'une requête bulk : liste JSON, ou NDJSON (un objet par
+    ligne) si Content-Type vaut application/x-ndjson.
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            payload = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            payload = json.loads(body or b"[]")
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Corps invalide : {e}")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Une liste d'enregistrements est attendue")
+    if len(payload) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Maximum {BULK_MAX_ROWS} lignes par requête")
+
+    items = []
+    for i, record in enumerate(payload):
+        try:
+            items.append(model.parse_obj(record))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail={"index": i, "errors": e.errors()})
+    return items
+
+# Contrainte unique (pays, date) posée par scripts/migrations.py
+UNIQUE_KEY_SQL = """
+    SELECT 1 FROM pg_constraint
+    WHERE conrelid = to_regclass(%s) AND conname = %s AND contype = 'u'
+"""
+
+def build_merge_query(table: str, columns: Dict[str, str], fields: List[str], upsert: bool,
+                      unique_key: bool = False) -> str:
+    """
+    Requête qui reporte `bulk_staging` dans la table cible.
+    En mode upsert, la dernière ligne reçue pour un couple (pays, date) met à
+    jour la ligne existante si ses valeurs changent, les autres sont insérées :
+    rejouer un lot est sans effet et compte 0 insertion, 0 mise à jour. Avec `unique_key` (contrainte unique de scripts/migrations.py),
+    la fusion passe par INSERT ... ON CONFLICT : deux lots concurrents ne
+    provoquent pas de violation d'unicité.
+    """
+    target = ", ".join(columns[f] for f in fields)
+    source = ", ".join(f"d.{f}" for f in fields)
+    if not upsert:
+        return f"""
+        WITH inserted AS (
+            INSERT INTO {table} ({target})
+            SELECT {source} FROM bulk_staging d ORDER BY d.ord
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM inserted) AS inserted, 0 AS updated
+    """
+    country, day = columns["country_region"], columns["date"]
+    values = [f for f in fields if f not in ("country_region", "date")]
+    current = ", ".join(f"t.{columns[f]}" for f in values)
+    if unique_key:
+        changes = ",\n                ".join(f"{columns[f]} = EXCLUDED.{columns[f]}" for f in values)
+        excluded = ", ".join(f"EXCLUDED.{columns[f]}" for f in values)
+        return f"""
+        WITH data AS (
+            SELECT DISTINCT ON (country_region, date) d.*,
+                   EXISTS (
+                       SELECT 1 FROM {table} t
+                       WHERE t.{country} = d.country_region AND t.{day} = d.date
+                   ) AS existed
+            FROM bulk_staging d
+            ORDER BY country_region, date, ord DESC
+        ),
+        merged AS (
+            INSERT INTO {table} AS t ({target})
+            SELECT {source} FROM data d
+            ORDER BY d.ord
+            ON CONFLICT ({country}, {day}) DO UPDATE
+            SET {changes}
+            WHERE ({current}) IS DISTINCT FROM ({excluded})
+            RETURNING t.{country} AS country_region, t.{day} AS date
+        )
+        SELECT count(*) FILTER (WHERE NOT d.existed) AS inserted,
+               count(*) FILTER (WHERE d.existed)     AS updated
+        FROM merged m JOIN data d USING (country_region, date)
+    """
+    assignments = ",\n                ".join(f"{columns[f]} = d.{f}" for f in values)
+    staged = ", ".join(f"d.{f}" for f in values)
+    return f"""
+        WITH data AS (
+            SELECT DISTINCT ON (country_region, date) *
+            FROM bulk_staging
+            ORDER BY country_region, date, ord DESC
+        ),
+        updated AS (
+            UPDATE {table} t
+            SET {assignments}
+            FROM data d
+            WHERE t.{country} = d.country_region AND t.{day} = d.date
+              AND ({current}) IS DISTINCT FROM ({staged})
+            RETURNING 1
+        ),
+        inserted AS (
+            INSERT INTO {table} ({target})
+            SELECT {source} FROM data d
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {table} t
+                WHERE t.{country} = d.country_region AND t.{day} = d.date
+            )
+            ORDER BY d.ord
+            RETURNING 1
+        )
+        SELECT (SELECT count(*) FROM inserted) AS inserted,
+               (SELECT count(*) FROM updated)  AS updated
+    """
+
+def bulk_write(table: str, columns: Dict[str, str], items: List[BaseModel], upsert: bool) -> BulkResult:
+    """Charge le lot via COPY dans une table temporaire puis fusionne, en une transaction."""
+    fields = [name for name in columns if name != "id"]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for ord_, item in enumerate(items):
+        record = item.dict()
+        writer.writerow([ord_] + [record[f] for f in fields])
+    buffer.seek(0)
+
+    staging_columns = ", ".join(
+        f"{f} {'text' if f == 'country_region' else 'date' if f == 'date' else 'double precision'}"
+        for f in fields
+    )
+    def work(conn):
+        conn.autocommit = False
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cur.execute(
+                    f"CREATE TEMP TABLE bulk_staging (ord integer, {staging_columns}) ON COMMIT DROP"
+                )
+                cur.copy_expert("COPY bulk_staging FROM STDIN WITH (FORMAT csv)", buffer)
+                cur.execute(UNIQUE_KEY_SQL, (table, f"{table}_country_date_key"))
+                unique_key = cur.fetchone() is not None
+                cur.execute(build_merge_query(table, columns, fields, upsert, unique_key))
+                counts = cur.fetchone()
+            conn.commit()
+            return counts
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if not conn.closed:
+                conn.autocommit = True
+
+    # Pas de nouvel essai : une connexion coupée pendant l'écriture donne un 503
+    try:
+        counts = pool.run(work)
+    except PoolUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except psycopg2.DataError as e:
+        raise HTTPException(status_code=422, detail=str(e).strip())
+    return BulkResult(received=len(items), inserted=counts["inserted"], updated=counts["updated"])
+
+# -------------------------------
+# Supervision
+# -------------------------------
+@app.get("/api/metrics/pool")
+def pool_metrics():
+    if async_pool is not None:
+        return async_pool.metrics()
+    return pool.metrics()
+
+# -------------------------------
+# Agrégats (vues matérialisées rafraîchies après chaque chargement)
+# -------------------------------
+def register_aggregate_routes(table: str):
+    @app.get(f"/api/{table}/latest", name=f"{table}_latest")
+    async def read_latest(country: Optional[List[str]] = Query(None)):
+        """Dernière ligne connue de chaque pays."""
+        return await read_aggregate(f"{table}_latest", country)
+
+    @app.get(f"/api/{table}/summary", name=f"{table}_summary")
+    async def read_table_summary(country: Optional[List[str]] = Query(None)):
+        """Totaux des dernières valeurs par pays (indicateurs du dashboard)."""
+        return await read_summary(table, country)
+
+    @app.get(f"/api/{table}/monthly", name=f"{table}_monthly")
+    async def read_monthly(
+        country: Optional[List[str]] = Query(None),
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ):
+        """Dernière valeur de chaque mois, par pays."""
+        return await read_aggregate(f"{table}_monthly", country, date_from, date_to)
+
+    @app.get(f"/api/{table}/monthly/global", name=f"{table}_global_monthly")
+    async def read_global_monthly(date_from: Optional[date] = None, date_to: Optional[date] = None):
+        """Somme de tous les pays, par mois."""
+        return await read_aggregate(f"{table}_global_monthly", None, date_from, date_to)
+
+for _table in ("covid19_daily", "mpox"):
+    register_aggregate_routes(_table)
 
 # -------------------------------
 # Routes COVID19_DAILY
 # -------------------------------
 @app.get("/api/covid19_daily", response_model=List[CovidItem])
-def read_covid():
-    query = """
-        SELECT
-            id,
-            country_region,
-            date,
-            total_cases,
-            total_deaths,
-            total_gueris
-        FROM covid19_daily
-    """
-    return fetchall_dicts(query)
+async def read_covid(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="en-tête X-Next-Cursor de la page précédente"),
+    country: Optional[List[str]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    fields: Optional[str] = Query(None, description="Colonnes séparées par des virgules"),
+):
+    query, params = build_page_query(
+        "covid19_daily", COVID_COLUMNS, fields, country, date_from, date_to, cursor, limit
+    )
+    rows = await afetchall_dicts(query, params)
+    return page_response(request, rows, limit, CovidItem, COVID_COLUMNS, fields)
+
+@app.get("/api/covid19_daily/export")
+def export_covid(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    gzip: bool = False,
+    country: Optional[List[str]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    fields: Optional[str] = Query(None, description="Colonnes séparées par des virgules"),
+):
+    return export_response("covid19_daily", COVID_COLUMNS, fmt, gzip, fields, country, date_from, date_to)
 
 @app.post("/api/covid19_daily", response_model=CovidItem, status_code=201)
-def create_covid(item: CovidCreate):
+async def create_covid(item: CovidCreate):
     query = """
-        INSERT INTO covid19_daily (country_region, date, total_cases, total_deaths, total_gueris)
+        INSERT INTO covid19_daily (country_region, date, total_cases, total_deaths, total_recovered)
         VALUES (%s, %s, %s, %s, %s)
-        RETURNING id, country_region, date, total_cases, total_deaths, total_gueris
+        RETURNING id, country_region, date, total_cases, total_deaths, total_recovered
     """
-    row = fetchone_dict(query, [
+    row = await afetchone_dict(query, [
         item.country_region,
         item.date,
         item.total_cases,
         item.total_deaths,
-        item.total_gueris
+        item.total_recovered
     ])
     return row
 
+@app.post("/api/covid19_daily/bulk", response_model=BulkResult)
+async def bulk_covid(request: Request, upsert: bool = True):
+    """Insère un lot de `CovidCreate` (liste JSON ou NDJSON) en une seule transaction."""
+    items = await parse_bulk_body(request, CovidCreate)
+    return await run_in_threadpool(bulk_write, "covid19_daily", COVID_COLUMNS, items, upsert)
+
 @app.put("/api/covid19_daily/{id}", response_model=CovidItem)
-def update_covid(id: int, item: CovidCreate):
+async def update_covid(id: int, item: CovidCreate):
     query = """
         UPDATE covid19_daily
-        SET country_region = %s,
-            date           = %s,
-            total_cases    = %s,
-            total_deaths   = %s,
-            total_gueris   = %s
+        SET country_region  = %s,
+            date            = %s,
+            total_cases     = %s,
+            total_deaths    = %s,
+            total_recovered = %s
         WHERE id = %s
-        RETURNING id, country_region, date, total_cases, total_deaths, total_gueris
+        RETURNING id, country_region, date, total_cases, total_deaths, total_recovered
     """
-    row = fetchone_dict(query, [
+    row = await afetchone_dict(query, [
         item.country_region,
         item.date,
         item.total_cases,
         item.total_deaths,
-        item.total_gueris,
+        item.total_recovered,
         id
     ])
     if not row:
@@ -120,13 +669,13 @@ def update_covid(id: int, item: CovidCreate):
     return row
 
 @app.delete("/api/covid19_daily/{id}", response_model=CovidItem)
-def delete_covid(id: int):
+async def delete_covid(id: int):
     query = """
         DELETE FROM covid19_daily
         WHERE id = %s
-        RETURNING id, country_region, date, total_cases, total_deaths, total_gueris
+        RETURNING id, country_region, date, total_cases, total_deaths, total_recovered
     """
-    row = fetchone_dict(query, [id])
+    row = await afetchone_dict(query, [id])
     if not row:
         raise HTTPException(status_code=404, detail="Data not found")
     return row
@@ -135,33 +684,40 @@ def delete_covid(id: int):
 # Routes MPOX
 # -------------------------------
 @app.get("/api/mpox", response_model=List[MpoxItem])
-def read_mpox():
-    query = """
-        SELECT
-            id,
-            "Country/Region" AS country_region,
-            "Date"           AS date,
-            "Total_Cases"    AS total_cases,
-            "Total_Deaths"   AS total_deaths,
-            "Total_Gueris"   AS total_recovered
-        FROM mpox
-    """
-    return fetchall_dicts(query)
+async def read_mpox(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="en-tête X-Next-Cursor de la page précédente"),
+    country: Optional[List[str]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    fields: Optional[str] = Query(None, description="Colonnes séparées par des virgules"),
+):
+    query, params = build_page_query(
+        "mpox", MPOX_COLUMNS, fields, country, date_from, date_to, cursor, limit
+    )
+    rows = await afetchall_dicts(query, params)
+    return page_response(request, rows, limit, MpoxItem, MPOX_COLUMNS, fields)
+
+@app.get("/api/mpox/export")
+def export_mpox(
+    fmt: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    gzip: bool = False,
+    country: Optional[List[str]] = Query(None),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    fields: Optional[str] = Query(None, description="Colonnes séparées par des virgules"),
+):
+    return export_response("mpox", MPOX_COLUMNS, fmt, gzip, fields, country, date_from, date_to)
 
 @app.post("/api/mpox", response_model=MpoxItem, status_code=201)
-def create_mpox(item: MpoxCreate):
+async def create_mpox(item: MpoxCreate):
     query = """
-        INSERT INTO mpox ("Country/Region", "Date", "Total_Cases", "Total_Deaths", "Total_Gueris")
+        INSERT INTO mpox (country_region, date, total_cases, total_deaths, total_recovered)
         VALUES (%s, %s, %s, %s, %s)
-        RETURNING
-            id,
-            "Country/Region" AS country_region,
-            "Date"           AS date,
-            "Total_Cases"    AS total_cases,
-            "Total_Deaths"   AS total_deaths,
-            "Total_Gueris"   AS total_recovered
-    """
-    row = fetchone_dict(query, [
+        RETURNING id, country_region, date, total_cases, total_deaths, total_recovered
+    """
+    row = await afetchone_dict(query, [
         item.country_region,
         item.date,
         item.total_cases,
@@ -170,25 +726,25 @@ def create_mpox(item: MpoxCreate):
     ])
     return row
 
+@app.post("/api/mpox/bulk", response_model=BulkResult)
+async def bulk_mpox(request: Request, upsert: bool = True):
+    """Insère un lot de `MpoxCreate` (liste JSON ou NDJSON) en une seule transaction."""
+    items = await parse_bulk_body(request, MpoxCreate)
+    return await run_in_threadpool(bulk_write, "mpox", MPOX_COLUMNS, items, upsert)
+
 @app.put("/api/mpox/{id}", response_model=MpoxItem)
-def update_mpox(id: int, item: MpoxCreate):
+async def update_mpox(id: int, item: MpoxCreate):
     query = """
         UPDATE mpox
-        SET "Country/Region" = %s,
-            "Date"           = %s,
-            "Total_Cases"    = %s,
-            "Total_Deaths"   = %s,
-            "Total_Gueris"   = %s
+        SET country_region  = %s,
+            date            = %s,
+            total_cases     = %s,
+            total_deaths    = %s,
+            total_recovered = %s
         WHERE id = %s
-        RETURNING
-            id,
-            "Country/Region" AS country_region,
-            "Date"           AS date,
-            "Total_Cases"    AS total_cases,
-            "Total_Deaths"   AS total_deaths,
-            "Total_Gueris"   AS total_recovered
-    """
-    row = fetchone_dict(query, [
+        RETURNING id, country_region, date, total_cases, total_deaths, total_recovered
+    """
+    row = await afetchone_dict(query, [
         item.country_region,
         item.date,
         item.total_cases,
@@ -201,19 +757,13 @@ def update_mpox(id: int, item: MpoxCreate):
     return row
 
 @app.delete("/api/mpox/{id}", response_model=MpoxItem)
-def delete_mpox(id: int):
+async def delete_mpox(id: int):
     query = """
         DELETE FROM mpox
         WHERE id = %s
-        RETURNING
-            id,
-            "Country/Region" AS country_region,
-            "Date"           AS date,
-            "Total_Cases"    AS total_cases,
-            "Total_Deaths"   AS total_deaths,
-            "Total_Gueris"   AS total_recovered
-    """
-    row = fetchone_dict(query, [id])
+        RETURNING id, country_region, date, total_cases, total_deaths, total_recovered
+    """
+    row = await afetchone_dict(query, [id])
     if not row:
         raise HTTPException(status_code=404, detail="Data not found")
     return row
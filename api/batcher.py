@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+
+class QueueFull(Exception):
+    """La file d'attente du batcher a atteint sa profondeur maximale."""
+
+
+class MicroBatcher:
+    """
+    Regroupe des appels unitaires concurrents en un seul appel vectorisé.
+
+    - Les requêtes déposent leur ligne dans une file asyncio et attendent
+      leur résultat.
+    - Une tâche de fond vide la file : elle attend au plus `max_wait_ms`
+      après la première ligne, ou que `max_batch` lignes soient arrivées,
+      puis appelle `fn(lignes)` dans un thread et rend à chaque requête le
+      résultat de même rang.
+    - Au-delà de `max_queue` lignes en attente, les nouveaux appels sont
+      refusés (QueueFull) plutôt que de laisser la latence exploser.
+    """
+
+    def __init__(self, fn, max_batch: int = 64, max_wait_ms: float = 5.0, max_queue: int = 1000):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self._queue = None
+        self._task = None
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "rows": 0,
+            "max_batch_seen": 0,
+            "rejected": 0,
+            "errors": 0,
+            "queue_time_total": 0.0,
+        }
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, row):
+        """Ajoute une ligne au prochain lot et retourne son résultat."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((row, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self._stats["rejected"] += 1
+            raise QueueFull(f"Plus de {self.max_queue} prédictions en attente")
+        self._stats["requests"] += 1
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Requêtes abandonnées par le client entre-temps
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+            now = time.perf_counter()
+            self._stats["batches"] += 1
+            self._stats["rows"] += len(batch)
+            self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(batch))
+            self._stats["queue_time_total"] += sum(now - queued for _, _, queued in batch)
+            try:
+                results = await run_in_threadpool(self.fn, [row for row, _, _ in batch])
+            except Exception as e:
+                self._stats["errors"] += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def metrics(self) -> dict:
+        stats = dict(self._stats)
+        batches, rows = stats["batches"], stats["rows"]
+        stats["avg_batch_size"] = rows / batches if batches else 0.0
+        stats["queue_time_avg"] = stats.pop("queue_time_total") / rows if rows else 0.0
+        stats["queue_depth"] = self._queue.qsize() if self._queue is not None else 0
+        stats["max_batch"] = self.max_batch
+        stats["max_wait_ms"] = self.max_wait * 1000
+        stats["max_queue"] = self.max_queue
+        return stats
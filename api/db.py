@@ -0,0 +1,194 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+
+
+class PoolUnavailable(Exception):
+    """Aucune connexion utilisable : base injoignable ou pool saturé."""
+
+
+class PoolTimeout(PoolUnavailable):
+    """Aucune connexion libérée dans le délai imparti."""
+
+
+class ConnectionPool:
+    """
+    Pool de connexions PostgreSQL partagé entre les threads de FastAPI.
+
+    - Taille bornée (minconn / maxconn) ; au-delà, les requêtes attendent
+      qu'une connexion se libère (jusqu'à `timeout` secondes).
+    - Les connexions fermées ou restées longtemps inactives sont vérifiées
+      (`SELECT 1`) avant d'être prêtées, et remplacées si elles sont cassées.
+      Une connexion coupée en cours de requête fait vérifier toutes les
+      autres ; `run(..., retry=True)` rejoue alors une lecture une fois.
+    - Le pool n'est créé qu'au premier usage : chaque worker uvicorn ouvre
+      ses propres connexions après le fork, et l'API démarre même si la base
+      n'est pas encore joignable.
+    """
+
+    def __init__(self, dsn: str, minconn: int = 1, maxconn: int = 10,
+                 timeout: float = 30.0, idle_check: float = 30.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._stats = {
+            "in_use": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "reconnects": 0,
+            "retries": 0,
+        }
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        self.minconn, self.maxconn, self.dsn
+                    )
+        return self._pool
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            conn.autocommit = True
+            last_used = self._last_used.get(id(conn))
+            if last_used is not None and time.monotonic() - last_used < self.idle_check:
+                return True
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        try:
+            self._get_pool().putconn(conn, close=True)
+        except psycopg2.pool.PoolError:
+            pass
+        with self._lock:
+            self._stats["reconnects"] += 1
+
+    def _checkout(self):
+        """
+        Connexion saine du pool. Après un redémarrage de PostgreSQL (ou une
+        coupure réseau), toutes les connexions inactives sont cassées : on les
+        jette une à une jusqu'à en trouver une saine ou en ouvrir une neuve,
+        au plus maxconn + 1 essais.
+        """
+        try:
+            pool = self._get_pool()
+            for _ in range(self.maxconn + 1):
+                conn = pool.getconn()
+                if self._is_healthy(conn):
+                    return conn
+                self._discard(conn)
+        except (psycopg2.OperationalError, psycopg2.pool.PoolError) as e:
+            raise PoolUnavailable(f"Base de données injoignable : {e}".strip()) from e
+        raise PoolUnavailable("Aucune connexion saine après reconnexion")
+
+    def _release(self, conn):
+        if conn.closed:
+            self._discard(conn)
+            return
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+        self._last_used[id(conn)] = time.monotonic()
+        self._get_pool().putconn(conn)
+
+    @contextmanager
+    def connection(self):
+        """Emprunte une connexion (autocommit) et la rend au pool à la sortie."""
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeout(f"Aucune connexion disponible après {self.timeout}s")
+        waited = time.monotonic() - start
+        with self._lock:
+            self._stats["in_use"] += 1
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+            if waited > 0.001:
+                self._stats["waits"] += 1
+
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if conn is not None:
+                if conn.closed:
+                    # Connexion coupée (redémarrage de PostgreSQL) : les autres
+                    # connexions inactives le sont sans doute aussi, elles seront
+                    # toutes vérifiées avant d'être prêtées
+                    with self._lock:
+                        self._last_used.clear()
+                self._discard(conn)
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                self._release(conn)
+            with self._lock:
+                self._stats["in_use"] -= 1
+            self._slots.release()
+
+    def run(self, work, retry: bool = False):
+        """
+        Exécute `work(conn)` sur une connexion du pool. Si la connexion est
+        coupée pendant l'appel, `work` est rejoué une fois sur une connexion
+        vérifiée quand `retry` est vrai (lectures idempotentes) ; sinon, ou si
+        le second essai échoue aussi, PoolUnavailable est levée.
+        """
+        for attempt in range(2):
+            used = []
+            try:
+                with self.connection() as conn:
+                    used.append(conn)
+                    return work(conn)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                if not used or not used[0].closed:
+                    raise  # erreur de la requête elle-même
+                if retry and attempt == 0:
+                    with self._lock:
+                        self._stats["retries"] += 1
+                    continue
+                raise PoolUnavailable(f"Connexion à la base perdue : {e}".strip()) from e
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max_size"] = self.maxconn
+        stats["saturation"] = stats["in_use"] / self.maxconn
+        stats["wait_time_avg"] = (
+            stats["wait_time_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        )
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+            self._last_used.clear()
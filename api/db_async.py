@@ -0,0 +1,60 @@
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+
+class AsyncPool:
+    """
+    Accès PostgreSQL natif asyncio (psycopg 3 + pool asynchrone).
+
+    Utilisé quand `DB_MODE=async` : une requête en attente de PostgreSQL ne
+    bloque plus un thread du threadpool, un seul worker uvicorn peut donc
+    servir plusieurs centaines de requêtes concurrentes.
+    Les requêtes SQL restent celles de l'API (placeholders `%s`).
+    """
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10, timeout: float = 30.0):
+        self.max_size = max_size
+        self._pool = AsyncConnectionPool(
+            dsn,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            kwargs={"autocommit": True, "row_factory": dict_row},
+            check=AsyncConnectionPool.check_connection,
+            open=False,
+        )
+
+    async def open(self):
+        await self._pool.open()
+
+    async def close(self):
+        await self._pool.close()
+
+    async def fetchall_dicts(self, query: str, params=None):
+        async with self._pool.connection() as conn:
+            cur = await conn.execute(query, params or ())
+            return await cur.fetchall()
+
+    async def fetchone_dict(self, query: str, params=None):
+        async with self._pool.connection() as conn:
+            cur = await conn.execute(query, params or ())
+            return await cur.fetchone()
+
+    def metrics(self) -> dict:
+        stats = self._pool.get_stats()
+        in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+        checkouts = stats.get("requests_num", 0)
+        wait_ms = stats.get("requests_wait_ms", 0)
+        return {
+            "in_use": in_use,
+            "checkouts": checkouts,
+            "waits": stats.get("requests_queued", 0),
+            "waiting": stats.get("requests_waiting", 0),
+            "wait_time_total": wait_ms / 1000,
+            "wait_time_avg": wait_ms / 1000 / checkouts if checkouts else 0.0,
+            "timeouts": stats.get("requests_errors", 0),
+            "reconnects": stats.get("connections_lost", 0),
+            "max_size": self.max_size,
+            "saturation": in_use / self.max_size,
+        }
+
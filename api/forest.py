@@ -0,0 +1,57 @@
+import json
+import os
+
+import numpy as np
+
+
+class CompactForest:
+    """
+    Évaluateur NumPy d'une forêt exportée par scripts/forest_export.py.
+
+    Expose `classes_` et `predict_proba` comme le RandomForestClassifier
+    d'origine, sans scikit-learn : pas de désérialisation pickle au
+    chargement et pas de validation coûteuse à chaque appel. Les tableaux
+    peuvent être ouverts en mmap (`mmap_mode="r"`) : le chargement est
+    immédiat et les pages sont partagées entre les workers.
+    """
+
+    ARRAYS = ("feature", "threshold", "children", "value", "roots")
+
+    def __init__(self, feature, threshold, children, value, roots, meta):
+        self.feature = feature
+        self.threshold = threshold
+        # (gauche, droite) à la suite : l'enfant de `n` est children[2n + (x > seuil)]
+        self.children = children.reshape(-1)
+        self.value = value
+        self.roots = roots
+        self.meta = meta
+        self.classes_ = np.array(meta["classes"])
+        self.n_features_in_ = meta["n_features"]
+        self.max_depth = meta["max_depth"]
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in cls.ARRAYS
+        }
+        return cls(meta=meta, **arrays)
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X doit avoir {self.n_features_in_} colonnes, reçu {X.shape}")
+        # Indices à plat dans X : ligne * n_features + variable du nœud
+        x = X.ravel()
+        row_offset = (np.arange(len(X)) * self.n_features_in_)[:, None]
+        # Un nœud courant par (ligne, arbre) ; les feuilles bouclent sur elles-mêmes
+        node = np.repeat(self.roots[None, :], len(X), axis=0)
+        for _ in range(self.max_depth):
+            go_right = x.take(row_offset + self.feature.take(node)) > self.threshold.take(node)
+            node = self.children.take(2 * node + go_right)
+        return self.value.take(node, axis=0).mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
@@ -1,16 +1,183 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import joblib
+import time
+_import_start = time.perf_counter()
+
+import hashlib
+import json
+import os
+import threading
+from typing import List, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
 import numpy as np
 
+from api.batcher import MicroBatcher, QueueFull
+from api.cache import LRUCache
+from api.forest import CompactForest
+
+# joblib et scikit-learn ne sont importés qu'au premier chargement d'un
+# modèle joblib : avec la forêt compacte, l'API démarre sans eux.
+IMPORT_TIME = time.perf_counter() - _import_start
+
 app = FastAPI()
 
-# Charger le modèle entraîné
-try:
-    model = joblib.load("model_covid_rf.joblib")
-except Exception as e:
-    model = None
-    print(f"Erreur lors du chargement du modèle : {e}")
+# Nombre maximal de lignes acceptées par /predict/batch
+PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", "10000"))
+
+# Micro-batching des appels unitaires à /predict (désactivé par défaut)
+PREDICT_BATCHING = os.getenv("PREDICT_BATCHING", "0") == "1"
+PREDICT_BATCH_SIZE = int(os.getenv("PREDICT_BATCH_SIZE", "64"))
+PREDICT_BATCH_WAIT_MS = float(os.getenv("PREDICT_BATCH_WAIT_MS", "5"))
+PREDICT_QUEUE_MAX = int(os.getenv("PREDICT_QUEUE_MAX", "1000"))
+
+# Cache des prédictions (PREDICT_CACHE_SIZE=0 le désactive, TTL en secondes, 0 = sans expiration)
+PREDICT_CACHE_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", "10000"))
+PREDICT_CACHE_TTL = float(os.getenv("PREDICT_CACHE_TTL", "0"))
+prediction_cache = LRUCache(PREDICT_CACHE_SIZE, PREDICT_CACHE_TTL)
+
+# Modèle servi : version courante du registre (models/current.json, écrit
+# par scripts/ml_pipeline.py), sinon le fichier historique MODEL_PATH
+MODEL_REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", "models")
+MODEL_PATH = os.getenv("MODEL_PATH", "model_covid_rf.joblib")
+# Intervalle (s) de vérification d'une nouvelle version, 0 = pas de surveillance
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "30"))
+# Jeton exigé par POST /admin/reload (en-tête X-Admin-Token) s'il est défini
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# "background" : l'API répond (/health) pendant le chargement du modèle et
+# /ready passe à 200 une fois prête ; "blocking" : chargement avant d'écouter
+MODEL_LOAD = os.getenv("MODEL_LOAD", "background")
+# Tableaux du modèle ouverts en mmap (partagés entre workers, chargement paresseux)
+MODEL_MMAP = os.getenv("MODEL_MMAP", "1") == "1"
+
+# Moteur d'inférence : "auto" utilise la forêt compacte (api/forest.py) quand
+# le registre en fournit une, "sklearn" force le modèle joblib
+MODEL_ENGINE = os.getenv("MODEL_ENGINE", "auto")
+# Au-delà de ce nombre de lignes, le modèle scikit-learn (compilé) est plus rapide
+COMPACT_MAX_ROWS = int(os.getenv("COMPACT_MAX_ROWS", "256"))
+
+class ModelHandle:
+    """
+    Une version du modèle : forêt compacte (si exportée) et modèle
+    scikit-learn, ce dernier chargé seulement s'il est nécessaire.
+    """
+
+    def __init__(self, version: str, source: str, compact=None, model=None):
+        self.version = version
+        self.source = source
+        self.compact = compact
+        self.model = model
+        self._lock = threading.Lock()
+
+    def estimator(self, n_rows: int):
+        """
+        Moteur à utiliser pour un appel de `n_rows` lignes. Peut charger le
+        modèle scikit-learn : à appeler hors de la boucle d'événements.
+        """
+        if self.compact is not None and n_rows <= COMPACT_MAX_ROWS:
+            return self.compact
+        if self.model is None:
+            with self._lock:
+                if self.model is None:
+                    self.model = load_joblib(self.source)
+        return self.model
+
+    @property
+    def engine(self) -> str:
+        return "compact" if self.compact is not None else "sklearn"
+
+# Remplacé d'un bloc à chaque rechargement : une requête en cours garde la
+# référence qu'elle a lue et termine avec l'ancien modèle.
+handle: Optional[ModelHandle] = None
+_reload_lock = threading.Lock()
+_file_versions = {}
+
+def file_version(path: str) -> str:
+    """Empreinte du fichier, recalculée seulement si sa taille ou sa date changent."""
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    if key not in _file_versions:
+        with open(path, "rb") as f:
+            _file_versions[key] = hashlib.sha256(f.read()).hexdigest()[:12]
+    return _file_versions[key]
+
+def load_joblib(path: str):
+    import joblib
+    return joblib.load(path, mmap_mode="r" if MODEL_MMAP else None)
+
+def resolve_model():
+    """(chemin, version, dossier de la forêt compacte ou None) du modèle à servir."""
+    pointer = os.path.join(MODEL_REGISTRY_DIR, "current.json")
+    if os.path.exists(pointer):
+        with open(pointer) as f:
+            meta = json.load(f)
+        path = os.path.join(MODEL_REGISTRY_DIR, meta["file"])
+        if os.path.exists(path):
+            forest = meta.get("forest")
+            if forest and MODEL_ENGINE != "sklearn":
+                forest = os.path.join(MODEL_REGISTRY_DIR, forest)
+                return path, meta["version"], forest if os.path.isdir(forest) else None
+            return path, meta["version"], None
+        print(f"Artefact {path} introuvable, repli sur {MODEL_PATH}")
+    return MODEL_PATH, file_version(MODEL_PATH), None
+
+def load_model(force: bool = False):
+    """
+    Charge le modèle désigné par le registre s'il diffère du modèle servi,
+    puis remplace la référence globale. En cas d'erreur, l'ancien modèle
+    reste en place. Retourne (handle courant, rechargé ou non).
+    """
+    global handle
+    with _reload_lock:
+        path, version, forest = resolve_model()
+        if not force and handle is not None and handle.version == version:
+            return handle, False
+        if forest is not None:
+            new_handle = ModelHandle(version, path, compact=CompactForest.load(
+                forest, mmap_mode="r" if MODEL_MMAP else None))
+        else:
+            new_handle = ModelHandle(version, path, model=load_joblib(path))
+        handle = new_handle
+        # Les clés du cache portent la version : les anciennes entrées ne servent plus
+        prediction_cache.clear()
+        if startup_state["status"] == "error":
+            # Premier chargement en échec (aucun modèle publié au démarrage) :
+            # un rechargement réussi rend l'API prête
+            startup_state.update(status="ready", error=None)
+        print(f"Modèle chargé : {forest or path} (version {version}, moteur {new_handle.engine})")
+        return new_handle, True
+
+_watch_stop = threading.Event()
+
+def watch_model(interval: float):
+    """Thread de surveillance : recharge le modèle quand le registre change."""
+    while not _watch_stop.wait(interval):
+        try:
+            load_model()
+        except Exception as e:
+            print(f"Rechargement du modèle impossible : {e}")
+
+# État du démarrage, exposé par /ready
+startup_state = {"status": "starting", "error": None, "timings": {"import_s": round(IMPORT_TIME, 3)}}
+
+def initial_load():
+    """Charge le modèle puis fait une première prédiction (warm-up), en chronométrant chaque étape."""
+    timings = startup_state["timings"]
+    try:
+        start = time.perf_counter()
+        current, _ = load_model()
+        timings["load_s"] = round(time.perf_counter() - start, 3)
+
+        start = time.perf_counter()
+        estimator = current.estimator(1)
+        score(np.zeros((1, estimator.n_features_in_)), estimator)
+        timings["warmup_s"] = round(time.perf_counter() - start, 3)
+        startup_state["status"] = "ready"
+        print(f"Démarrage : imports {timings['import_s']:.3f}s, chargement {timings['load_s']:.3f}s, "
+              f"warm-up {timings['warmup_s']:.3f}s (moteur {current.engine})")
+    except Exception as e:
+        startup_state.update(status="error", error=str(e))
+        print(f"Erreur lors du chargement du modèle : {e}")
 
 class PredictionRequest(BaseModel):
     total_deaths: int
@@ -20,22 +187,201 @@ class PredictionResponse(BaseModel):
     prediction: int
     probability: float
 
+def score(X: np.ndarray, model):
+    """
+    Un seul passage dans la forêt : la classe prédite est déduite des
+    probabilités (argmax, comme le fait model.predict) au lieu d'appeler
+    predict puis predict_proba.
+    Retourne (classes prédites, probabilité de la classe 1).
+    """
+    proba = model.predict_proba(X)
+    preds = model.classes_[proba.argmax(axis=1)]
+    return preds, proba[:, 1]
+
+def score_rows(rows):
+    """Version liste de score(), utilisée par le micro-batcher."""
+    current = handle
+    preds, probas = score(np.array(rows), current.estimator(len(rows)))
+    return list(zip(preds.tolist(), probas.tolist()))
+
+batcher = MicroBatcher(score_rows, PREDICT_BATCH_SIZE, PREDICT_BATCH_WAIT_MS, PREDICT_QUEUE_MAX) \
+    if PREDICT_BATCHING else None
+
+def require_model() -> ModelHandle:
+    """Modèle servi, ou 503 pendant le chargement initial / 500 s'il a échoué."""
+    current = handle
+    if current is None:
+        if startup_state["status"] == "starting":
+            raise HTTPException(status_code=503, detail="Modèle en cours de chargement")
+        raise HTTPException(status_code=500, detail="Modèle non chargé")
+    return current
+
+@app.on_event("startup")
+def start_model_load():
+    if MODEL_LOAD == "blocking":
+        initial_load()
+    else:
+        threading.Thread(target=initial_load, name="model-loader", daemon=True).start()
+
+@app.on_event("startup")
+async def start_batcher():
+    if batcher is not None:
+        await batcher.start()
+
+@app.on_event("startup")
+def start_model_watcher():
+    if MODEL_WATCH_INTERVAL > 0:
+        threading.Thread(target=watch_model, args=(MODEL_WATCH_INTERVAL,),
+                         name="model-watcher", daemon=True).start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    if batcher is not None:
+        await batcher.stop()
+
+@app.on_event("shutdown")
+def stop_model_watcher():
+    _watch_stop.set()
+
 @app.get("/")
 def root():
     return {"message": "API IA opérationnelle"}
 
+@app.get("/health")
+def health():
+    """Liveness : le processus répond, modèle chargé ou non."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    """Readiness : 200 une fois le modèle chargé et échauffé, 503 sinon."""
+    state = dict(startup_state, version=handle.version if handle else None)
+    if state["status"] != "ready":
+        raise HTTPException(status_code=503, detail=state)
+    return state
+
+def predict_one(row, model):
+    preds, probas = score(np.array([row]), model)
+    return preds[0], probas[0]
+
 @app.post("/predict", response_model=PredictionResponse)
-def predict(req: PredictionRequest):
+async def predict(req: PredictionRequest):
     """
     Prédire si un pays dépasse 10 000 cas en fonction des décès et guérisons totaux.
     Retourne la classe prédite et la probabilité associée.
+    Avec PREDICT_BATCHING=1, les appels concurrents sont regroupés en un seul
+    passage dans le modèle.
     """
-    if model is None:
-        raise HTTPException(status_code=500, detail="Modèle non chargé")
-    try:
-        X = np.array([[req.total_deaths, req.total_recovered]])
-        pred = model.predict(X)[0]
-        proba = float(model.predict_proba(X)[0][1])
+    current = require_model()
+    row = (req.total_deaths, req.total_recovered)
+    version = current.version
+    cached = prediction_cache.get((version, *row))
+    if cached is not None:
+        pred, proba = cached
         return PredictionResponse(prediction=pred, probability=proba)
+    try:
+        if batcher is not None:
+            pred, proba = await batcher.submit(list(row))
+        else:
+            pred, proba = await run_in_threadpool(lambda: predict_one(list(row), current.estimator(1)))
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    pred, proba = int(pred), float(proba)
+    # Pas de mise en cache si le modèle a changé pendant le calcul
+    if version == handle.version:
+        prediction_cache.set((version, *row), (pred, proba))
+    return PredictionResponse(prediction=pred, probability=proba)
+
+@app.get("/metrics/batcher")
+def batcher_metrics():
+    """Compteurs du micro-batcher : lots, taille moyenne, profondeur de file, rejets."""
+    if batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **batcher.metrics()}
+
+@app.get("/metrics/cache")
+def cache_metrics():
+    """Compteurs du cache des prédictions : hits, misses, taux de hit, taille."""
+    return {"model_version": handle.version if handle else None, **prediction_cache.metrics()}
+
+@app.get("/model")
+def model_info():
+    """Version et fichier du modèle actuellement servi."""
+    if handle is None:
+        return {"version": None, "source": None, "engine": None}
+    return {"version": handle.version, "source": handle.source, "engine": handle.engine}
+
+@app.post("/admin/reload")
+async def reload_model(force: bool = False, x_admin_token: Optional[str] = Header(None)):
+    """
+    Recharge le modèle depuis le registre (en arrière-plan, dans un thread)
+    puis le substitue au modèle servi ; les requêtes en cours ne sont pas
+    interrompues. `force` recharge même si la version n'a pas changé.
+    """
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Jeton d'administration invalide")
+    try:
+        current, reloaded = await run_in_threadpool(load_model, force)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Rechargement impossible : {e}")
+    return {"version": current.version, "source": current.source, "engine": current.engine,
+            "reloaded": reloaded}
+
+async def parse_batch_body(request: Request) -> List[PredictionRequest]:
+    """
+    Lit le corps de /predict/batch : liste JSON, ou NDJSON (un objet par
+    ligne) si Content-Type vaut application/x-ndjson.
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            payload = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            payload = json.loads(body or b"[]")
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Corps invalide : {e}")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Une liste d'enregistrements est attendue")
+    if len(payload) > PREDICT_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Maximum {PREDICT_BATCH_MAX_ROWS} lignes par requête")
+
+    items = []
+    for i, record in enumerate(payload):
+        try:
+            items.append(PredictionRequest.parse_obj(record))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail={"index": i, "errors": e.errors()})
+    return items
+
+@app.post("/predict/batch", response_model=List[PredictionResponse])
+async def predict_batch(request: Request):
+    """
+    Prédiction sur une liste d'enregistrements (JSON ou NDJSON), en un seul
+    appel vectorisé au modèle. Les réponses sont dans l'ordre des entrées.
+    """
+    current = require_model()
+    items = await parse_batch_body(request)
+    if not items:
+        return []
+    # Seules les lignes absentes du cache passent par le modèle (en un seul appel)
+    version = current.version
+    rows = [(it.total_deaths, it.total_recovered) for it in items]
+    results = [prediction_cache.get((version, *row)) for row in rows]
+    missing = sorted({row for row, res in zip(rows, results) if res is None})
+    if missing:
+        try:
+            preds, probas = await run_in_threadpool(
+                lambda: score(np.array(missing), current.estimator(len(missing))))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        computed = dict(zip(missing, zip(preds.tolist(), probas.tolist())))
+        if version == handle.version:
+            for row, res in computed.items():
+                prediction_cache.set((version, *row), res)
+        results = [res if res is not None else computed[row] for row, res in zip(rows, results)]
+    return [
+        {"prediction": int(p), "probability": float(pr)}
+        for p, pr in results
+    ]
@@ -0,0 +1,97 @@
+# aggregates.py
+# Vues matérialisées pré-agrégées, rafraîchies après chaque chargement
+# (store_data.py) et lues par l'API et le dashboard :
+#   <table>_latest          dernière ligne connue de chaque pays (KPI, carte)
+#   <table>_monthly         dernière valeur de chaque mois, par pays
+#   <table>_global_monthly  somme des pays par mois
+# Chaque vue a un index unique : REFRESH ... CONCURRENTLY ne bloque pas les
+# lecteurs pendant le recalcul.
+#
+#   python aggregates.py [--tables covid19_daily mpox]
+
+import argparse
+import os
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+
+TABLES = ["covid19_daily", "mpox"]
+
+VIEWS = {
+    "latest": ("""
+        SELECT DISTINCT ON (country_region)
+               country_region, date, total_cases, total_deaths, total_recovered
+        FROM {table}
+        WHERE country_region IS NOT NULL AND date IS NOT NULL
+        ORDER BY country_region, date DESC, id DESC
+    """, "(country_region)"),
+    "monthly": ("""
+        SELECT DISTINCT ON (country_region, date_trunc('month', date))
+               country_region, date_trunc('month', date)::date AS month,
+               date, total_cases, total_deaths, total_recovered
+        FROM {table}
+        WHERE country_region IS NOT NULL AND date IS NOT NULL
+        ORDER BY country_region, date_trunc('month', date), date DESC, id DESC
+    """, "(country_region, month)"),
+    "global_monthly": ("""
+        SELECT month,
+               count(*)             AS countries,
+               sum(total_cases)     AS total_cases,
+               sum(total_deaths)    AS total_deaths,
+               sum(total_recovered) AS total_recovered
+        FROM {table}_monthly
+        GROUP BY month
+    """, "(month)"),
+}
+
+
+def view_name(table, view):
+    return f"{table}_{view}"
+
+
+def ensure_views(cur, table):
+    """Crée les vues de `table` si elles n'existent pas (dans l'ordre de VIEWS)."""
+    for view, (query, key) in VIEWS.items():
+        name = view_name(table, view)
+        cur.execute(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {query.format(table=table)}")
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_key ON {name} {key}")
+
+
+def refresh(database_url, tables=TABLES):
+    """
+    Crée au besoin puis rafraîchit les vues des tables données. Une vue
+    jamais remplie est rafraîchie normalement, les suivantes en CONCURRENTLY.
+    """
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for table in tables:
+                ensure_views(cur, table)
+                for view in VIEWS:
+                    name = view_name(table, view)
+                    start = time.perf_counter()
+                    cur.execute("SELECT ispopulated FROM pg_matviews WHERE matviewname = %s", (name,))
+                    concurrently = "CONCURRENTLY " if cur.fetchone()[0] else ""
+                    cur.execute(f"REFRESH MATERIALIZED VIEW {concurrently}{name}")
+                    cur.execute(f"SELECT count(*) FROM {name}")
+                    print(f" {name} : {cur.fetchone()[0]} lignes en {time.perf_counter() - start:.2f}s")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rafraîchissement des vues pré-agrégées")
+    parser.add_argument("--tables", nargs="+", default=TABLES, choices=TABLES)
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("La variable DATABASE_URL est manquante")
+    refresh(database_url, args.tables)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark de l'API CRUD : compare les modes d'accès base `sync` et `async`.
+
+Pour chaque mode, lance un serveur uvicorn (DB_MODE=<mode>) sur un port dédié,
+envoie des requêtes concurrentes puis affiche débit et latences.
+
+    python scripts/bench_api.py --requests 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+DEFAULT_PATH = "/api/covid19_daily?limit=100&fields=country_region,date,total_cases,total_deaths"
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def start_server(mode: str, port: int, pool_max: int) -> subprocess.Popen:
+    env = dict(os.environ, DB_MODE=mode, DB_POOL_MAX=str(pool_max))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.api:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT_DIR,
+        env=env,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                r = await client.get(f"{base_url}/api/metrics/pool")
+                if r.status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Serveur {base_url} non démarré après {timeout}s")
+
+
+async def run_load(base_url: str, path: str, n_requests: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for _ in range(n_requests):
+        queue.put_nowait(None)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    r = await client.get(path)
+                    if r.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        pool = (await client.get("/api/metrics/pool")).json()
+
+    latencies.sort()
+    return {
+        "req_s": n_requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "errors": errors,
+        "pool_wait_avg_ms": pool.get("wait_time_avg", 0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--pool-max", type=int, default=10)
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    load_dotenv()
+    if not os.getenv("DATABASE_URL"):
+        raise RuntimeError("DATABASE_URL not set in .env")
+
+    results = {}
+    for i, mode in enumerate(args.modes):
+        port = args.port + i
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(mode, port, args.pool_max)
+        try:
+            asyncio.run(wait_ready(base_url))
+            # Échauffement : ouverture des connexions du pool
+            asyncio.run(run_load(base_url, args.path, args.pool_max, args.pool_max))
+            results[mode] = asyncio.run(run_load(base_url, args.path, args.requests, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"\n{args.requests} requêtes, concurrence {args.concurrency}, pool max {args.pool_max} : {args.path}")
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'attente pool ms':>18}{'erreurs':>9}")
+    for mode, r in results.items():
+        print(f"{mode:<8}{r['req_s']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+              f"{r['max_ms']:>10.1f}{r['pool_wait_avg_ms']:>18.2f}{r['errors']:>9}")
+
+
+if __name__ == "__main__":
+    main()
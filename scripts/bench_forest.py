@@ -0,0 +1,86 @@
+"""
+Benchmark du moteur d'inférence : RandomForest scikit-learn (joblib) contre
+la forêt compacte exportée (api/forest.py, tableaux NumPy en mmap).
+
+Mesure le chargement (temps, mémoire allouée, taille sur disque) puis la
+latence de predict_proba pour plusieurs tailles de lot.
+
+    python scripts/bench_forest.py --model model_covid_rf.joblib --rows 1 64 1000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(ROOT_DIR)
+from api.forest import CompactForest
+from forest_export import export_forest
+
+
+def measure_load(load):
+    """
+    Premier chargement chronométré (imports de scikit-learn compris, comme au
+    démarrage de l'API), puis un second sous tracemalloc pour la mémoire.
+    """
+    start = time.perf_counter()
+    obj = load()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    load()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return obj, elapsed, peak
+
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def latency_ms(model, X, repeat):
+    model.predict_proba(X)  # échauffement
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict_proba(X)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="model_covid_rf.joblib")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 16, 256, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    clf, sk_load, sk_mem = measure_load(lambda: joblib.load(args.model))
+    with tempfile.TemporaryDirectory() as tmp:
+        forest_dir = os.path.join(tmp, "forest")
+        meta = export_forest(clf, forest_dir)
+        forest, cf_load, cf_mem = measure_load(lambda: CompactForest.load(forest_dir))
+
+        print(f"Forêt : {meta['n_trees']} arbres, {meta['n_nodes']} nœuds, profondeur max {meta['max_depth']}")
+        print(f"{'moteur':<10}{'chargement ms':>15}{'mémoire Ko':>12}{'disque Ko':>11}")
+        print(f"{'sklearn':<10}{sk_load * 1000:>15.1f}{sk_mem / 1024:>12.0f}{dir_size(args.model) / 1024:>11.0f}")
+        print(f"{'compact':<10}{cf_load * 1000:>15.1f}{cf_mem / 1024:>12.0f}{dir_size(forest_dir) / 1024:>11.0f}")
+
+        rng = np.random.default_rng(0)
+        print(f"\n{'lignes':>8}{'sklearn ms':>12}{'compact ms':>12}{'écart max':>12}")
+        for n in args.rows:
+            X = np.c_[rng.integers(0, 5000, n), rng.integers(0, 500000, n)]
+            diff = np.abs(clf.predict_proba(X) - forest.predict_proba(X)).max()
+            print(f"{n:>8}{latency_ms(clf, X, args.repeat):>12.3f}"
+                  f"{latency_ms(forest, X, args.repeat):>12.3f}{diff:>12.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 # clean_and_standardize.py
 
+import argparse
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 
 # Répertoires de données
@@ -9,54 +13,213 @@ data_dir   = os.path.join(base_dir, "data")
 output_dir = os.path.join(base_dir, "cleaned_data")
 os.makedirs(output_dir, exist_ok=True)
 
-def clean_and_standardize(file_path, output_name, columns_map, relevant_columns, continents=None):
+# Dernière date stockée par pays, écrite par store_data.py après chaque chargement
+watermark_file = os.path.join(output_dir, "watermarks.json")
+
+def load_watermarks(path=watermark_file):
+    """Retourne {table: {pays: date}} ou {} si aucun chargement n'a encore eu lieu."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def reopen_dates(watermarks):
     """
-    Nettoie et standardise le fichier CSV :
-    - Conserve les colonnes pertinentes.
-    - Remplace les valeurs manquantes par 0.
-    - Renomme les colonnes selon columns_map.
-    - Ajoute 'total_recovered' = total_cases - total_deaths.
-    - Filtre pour le dernier jour du mois par pays.
-    - Ajoute une colonne 'id' auto-incrémentée.
+    Pour chaque pays, premier jour du mois de sa dernière date stockée :
+    ce mois peut encore recevoir de nouveaux jours, il est donc retraité.
     """
-    df = pd.read_csv(file_path)
-    print(f"Nettoyage : {file_path}")
+    return {
+        country: pd.Timestamp(day).to_period('M').to_timestamp()
+        for country, day in watermarks.items()
+    }
 
-    # Sélection + valeurs manquantes
-    df = df[relevant_columns].fillna(0)
+# Taille des morceaux lus dans le CSV brut
+CHUNK_SIZE = 200_000
 
-    # Renommage initial
-    df.rename(columns=columns_map, inplace=True)
+# En dessous de ce nombre de lignes, un fichier n'est pas découpé en tranches
+PARTITION_MIN_ROWS = 500_000
 
-    # Harmonisation du nom du pays
-    if 'Country/Region' in df.columns:
-        df.rename(columns={'Country/Region': 'country_region'}, inplace=True)
+def count_rows(file_path):
+    """Nombre de lignes de données (hors en-tête), sans parser le CSV."""
+    with open(file_path, 'rb') as f:
+        lines = sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+    return max(lines - 1, 0)
 
-    # Conversion de la date
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    df.dropna(subset=['date'], inplace=True)
+def read_raw_chunks(file_path, columns_map, relevant_columns, chunksize=CHUNK_SIZE, skiprows=0, nrows=None):
+    """
+    Lit le CSV brut par morceaux : uniquement les colonnes utiles, pays en
+    'category' et compteurs en int32 (au lieu d'object / float64).
+    `skiprows` / `nrows` limitent la lecture à une tranche de lignes de données.
+    """
+    country_col = next(c for c in relevant_columns if columns_map.get(c) == 'Country/Region')
+    count_cols = [c for c in relevant_columns if c not in (country_col, 'date')]
+    names = pd.read_csv(file_path, nrows=0).columns
+    for chunk in pd.read_csv(file_path, usecols=relevant_columns, chunksize=chunksize,
+                             header=None, names=names, skiprows=skiprows + 1, nrows=nrows,
+                             dtype={country_col: 'category', **{c: 'float64' for c in count_cols}}):
+        chunk[count_cols] = chunk[count_cols].fillna(0).astype('int32')
+        yield chunk
 
-    # Calcul uniformisé total_recovered
-    df['total_recovered'] = df['total_cases'] - df['total_deaths']
+def keep_latest(df):
+    """Dernière ligne (par date) de chaque (pays, mois) ; à égalité, la plus tardive du fichier."""
+    return (df.sort_values('date', kind='stable')
+              .drop_duplicates(['country_region', 'year_month'], keep='last'))
 
-    # Exclusion des continents si demandé
-    if continents and 'country_region' in df.columns:
-        df = df[~df['country_region'].isin(continents)]
+def reduce_latest(file_path, columns_map, relevant_columns, continents=None, since=None,
+                  chunksize=CHUNK_SIZE, skiprows=0, nrows=None):
+    """
+    Parcourt le CSV brut (ou une tranche de lignes) et ne garde que la dernière
+    ligne connue de chaque (pays, mois). Retourne (lignes gardées, lignes lues).
+    """
+    latest = None
+    rows_read = 0
+    for df in read_raw_chunks(file_path, columns_map, relevant_columns, chunksize, skiprows, nrows):
+        rows_read += len(df)
+
+        # Renommage initial
+        df = df.rename(columns=columns_map)
+
+        # Harmonisation du nom du pays
+        if 'Country/Region' in df.columns:
+            df = df.rename(columns={'Country/Region': 'country_region'})
+
+        # Conversion de la date
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df = df.dropna(subset=['date'])
+
+        # Mode incrémental : on ignore l'historique déjà stocké
+        if since:
+            start = df['country_region'].astype(object).map(since)
+            df = df[start.isna() | (df['date'] >= start)]
+
+        # Exclusion des continents si demandé
+        if continents and 'country_region' in df.columns:
+            df = df[~df['country_region'].isin(continents)]
+
+        # Dernière ligne de chaque (pays, mois) : morceau courant + état précédent
+        df = df.assign(year_month=df['date'].dt.to_period('M'))
+        df['country_region'] = df['country_region'].astype(object)
+        if latest is not None:
+            df = pd.concat([latest, df], ignore_index=True)
+        latest = keep_latest(df)
 
+    if latest is None:
+        latest = pd.DataFrame(columns=['country_region', 'year_month', 'date', 'total_cases', 'total_deaths'])
+    return latest, rows_read
+
+def finalize(latest):
+    """Met en forme les lignes gardées : tri, total_recovered et id."""
     # Garder le dernier jour du mois
-    df['year_month'] = df['date'].dt.to_period('M')
-    df = df.sort_values('date').groupby(['country_region','year_month'], as_index=False).last()
-    df.drop(columns=['year_month'], inplace=True)
+    df = latest.sort_values(['country_region', 'year_month'])
+    df = df[['country_region', 'date', 'total_cases', 'total_deaths']].reset_index(drop=True)
+
+    # Calcul uniformisé total_recovered
+    df['total_recovered'] = df['total_cases'] - df['total_deaths']
 
     # ID auto-incrémenté
     df.insert(0, 'id', range(1, len(df) + 1))
+    return df
 
-    # Sauvegarde
+def save_csv(df, output_name, rows_read):
     out_path = os.path.join(output_dir, output_name)
     df.to_csv(out_path, index=False)
-    print(f"Enregistré : {out_path}")
+    print(f"Enregistré : {out_path} ({rows_read} lignes lues, {len(df)} lignes écrites)")
+
+def clean_and_standardize(file_path, output_name, columns_map, relevant_columns, continents=None, since=None,
+                          chunksize=CHUNK_SIZE, write_csv=True):
+    """
+    Nettoie et standardise le fichier CSV :
+    - Conserve les colonnes pertinentes.
+    - Remplace les valeurs manquantes par 0.
+    - Renomme les colonnes selon columns_map.
+    - Ajoute 'total_recovered' = total_cases - total_deaths.
+    - Filtre pour le dernier jour du mois par pays.
+    - Ajoute une colonne 'id' auto-incrémentée.
+    Si `since` ({pays: date}) est fourni, seules les lignes à partir de cette
+    date sont traitées pour les pays concernés (mode incrémental).
+    Le fichier est lu par morceaux de `chunksize` lignes : seule la dernière
+    ligne connue de chaque (pays, mois) est conservée entre deux morceaux, la
+    mémoire dépend donc du nombre de pays × mois et non de la taille du fichier.
+    """
+    print(f"Nettoyage : {file_path}")
+    latest, rows_read = reduce_latest(file_path, columns_map, relevant_columns, continents, since, chunksize)
+    df = finalize(latest)
+
+    # Sauvegarde
+    if write_csv:
+        save_csv(df, output_name, rows_read)
     return df
 
+def clean_task(table, part, params, continents, since, chunksize, skiprows, nrows):
+    """Tâche exécutée dans un processus du pool : une tranche d'un jeu de données."""
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    latest, rows_read = reduce_latest(params['file_path'], params['columns_map'], params['relevant_columns'],
+                                      continents, since, chunksize, skiprows, nrows)
+    return table, part, latest, rows_read, time.perf_counter() - start, time.process_time() - cpu_start
+
+def plan_tasks(datasets, partitions, min_rows=PARTITION_MIN_ROWS):
+    """
+    Découpe chaque jeu en `partitions` tranches de lignes contiguës (skiprows, nrows).
+    Les fichiers bruts étant triés par pays, chaque tranche couvre un groupe de
+    pays ; les (pays, mois) à cheval sur deux tranches sont fusionnés ensuite.
+    Les petits fichiers (< min_rows lignes) restent en une seule tâche.
+    """
+    tasks = []
+    for table, params in datasets.items():
+        n = 1
+        if partitions > 1:
+            total = count_rows(params['file_path'])
+            if total >= min_rows:
+                n = partitions
+        if n == 1:
+            tasks.append((table, 0, 0, None))
+            continue
+        size = -(-total // n)
+        for part in range(n):
+            tasks.append((table, part, part * size, size if part < n - 1 else None))
+    return tasks
+
+def run_pipeline(datasets, workers=None, partitions=1, continents=None, since_by_table=None,
+                 chunksize=CHUNK_SIZE, write_csv=True):
+    """
+    Nettoie tous les jeux de données en parallèle dans un pool de processus
+    (une tâche par jeu, ou par tranche avec `partitions` > 1) et affiche la
+    durée de chaque tâche. Retourne {table: DataFrame nettoyé}.
+    """
+    since_by_table = since_by_table or {}
+    tasks = plan_tasks(datasets, partitions)
+    workers = workers or min(len(tasks), os.cpu_count() or 1)
+    print(f"Nettoyage de {len(datasets)} jeux : {len(tasks)} tâches, {workers} processus")
+
+    start = time.perf_counter()
+    results = {table: {} for table in datasets}
+    rows = {table: 0 for table in datasets}
+    n_parts = {table: sum(t[0] == table for t in tasks) for table in datasets}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(clean_task, table, part, datasets[table], continents,
+                        since_by_table.get(table), chunksize, skiprows, nrows)
+            for table, part, skiprows, nrows in tasks
+        ]
+        for future in as_completed(futures):
+            table, part, latest, rows_read, elapsed, cpu = future.result()
+            results[table][part] = latest
+            rows[table] += rows_read
+            print(f" {table} [{part + 1}/{n_parts[table]}] : {rows_read} lignes en {elapsed:.2f}s "
+                  f"(CPU {cpu:.2f}s)")
+
+    cleaned = {}
+    for table, parts in results.items():
+        # Concaténation dans l'ordre du fichier : à date égale, la tranche la plus tardive l'emporte
+        latest = pd.concat([parts[p] for p in sorted(parts)], ignore_index=True)
+        df = finalize(keep_latest(latest))
+        if write_csv:
+            save_csv(df, datasets[table]['output_name'], rows[table])
+        cleaned[table] = df
+    print(f"Nettoyage terminé en {time.perf_counter() - start:.2f}s")
+    return cleaned
+
 # Continents à exclure (exemple)
 continents_to_exclude = ["Africa","Asia","Europe","North America","South America","Oceania","Antarctica"]
 
@@ -82,6 +245,55 @@ relevant_mpox = ['date','location','total_cases','total_deaths']
 covid_file = os.path.join(data_dir, 'worldometer_coronavirus_daily_data.csv')
 mpox_file  = os.path.join(data_dir, 'owid-monkeypox-data.csv')
 
-# Exécution
-clean_and_standardize(covid_file, 'cleaned_covid19_daily_dataset.csv', columns_map_covid, relevant_covid, continents_to_exclude)
-clean_and_standardize(mpox_file,  'cleaned_mpox_dataset.csv',                         columns_map_mpox,   relevant_mpox,   continents_to_exclude)
+# Jeux de données, indexés par table de destination
+DATASETS = {
+    'covid19_daily': dict(file_path=covid_file, output_name='cleaned_covid19_daily_dataset.csv',
+                          columns_map=columns_map_covid, relevant_columns=relevant_covid),
+    'mpox':          dict(file_path=mpox_file, output_name='cleaned_mpox_dataset.csv',
+                          columns_map=columns_map_mpox, relevant_columns=relevant_mpox),
+}
+
+def delta_name(output_name):
+    return output_name.replace('.csv', '_delta.csv')
+
+def main():
+    parser = argparse.ArgumentParser(description="Nettoyage des jeux de données bruts")
+    parser.add_argument("--incremental", action="store_true",
+                        help="ne traiter que les dates postérieures au dernier chargement (watermarks.json)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE,
+                        help="nombre de lignes brutes lues par morceau")
+    parser.add_argument("--format", choices=["csv", "parquet", "both"], default="csv",
+                        help="format de sortie : CSV, Parquet partitionné par année, ou les deux")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="nombre de processus (défaut : un par tâche, au plus le nombre de CPU)")
+    parser.add_argument("--partitions", type=int, default=1,
+                        help=f"tranches par fichier de plus de {PARTITION_MIN_ROWS} lignes")
+    args = parser.parse_args()
+
+    if args.format != "csv":
+        import parquet_store
+
+    datasets = {}
+    since_by_table = {}
+    watermarks = load_watermarks() if args.incremental else {}
+    for table, params in DATASETS.items():
+        params = dict(params)
+        if args.incremental:
+            since_by_table[table] = reopen_dates(watermarks.get(table, {}))
+            params['output_name'] = delta_name(params['output_name'])
+        datasets[table] = params
+
+    cleaned = run_pipeline(datasets, workers=args.workers, partitions=args.partitions,
+                           continents=continents_to_exclude, since_by_table=since_by_table,
+                           chunksize=args.chunksize, write_csv=args.format != "parquet")
+
+    if args.format != "csv":
+        for table, df in cleaned.items():
+            if args.incremental:
+                parquet_store.write_dataset(df, f"{table}_delta")
+                parquet_store.upsert_dataset(df, table)
+            else:
+                parquet_store.write_dataset(df, table)
+
+if __name__ == "__main__":
+    main()
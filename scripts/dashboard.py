@@ -4,11 +4,14 @@ import pandas as pd
 import plotly.express as px
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
-from prophet import Prophet
-from sklearn.metrics import mean_absolute_error
 import plotly.graph_objs as go
 import requests
 
+import dashboard_data
+import downsample
+import forecasts
+import shared_cache
+
 # --- Modern CSS & Responsive ---
 st.markdown(
     """
@@ -149,37 +152,77 @@ tabs = st.tabs(["Accueil", "Visualisations", "Prédiction IA", "Tableau de donn
 # --- Sidebar (Filtres principaux) ---
 st.sidebar.title("Filtres principaux")
 load_dotenv()
+# DASHBOARD_SOURCE=parquet : lecture du jeu Parquet de clean_datasets.py au lieu de la base
+DASHBOARD_SOURCE = os.getenv("DASHBOARD_SOURCE", "db")
 DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    st.sidebar.error("DATABASE_URL introuvable")
-    st.stop()
-engine = create_engine(DATABASE_URL)
+if DASHBOARD_SOURCE != "parquet":
+    if not DATABASE_URL:
+        st.sidebar.error("DATABASE_URL introuvable")
+        st.stop()
+    engine = create_engine(DATABASE_URL)
+else:
+    engine = None
 
-@st.cache_data
-def load_table(table_name: str) -> pd.DataFrame:
-    df = pd.read_sql(f"SELECT * FROM {table_name};", con=engine)
-    df.columns = [c.lower().replace(' ', '_') for c in df.columns]
-    for col in df.columns:
-        if col.startswith('country'):
-            df.rename(columns={col: 'country'}, inplace=True)
-            break
-    if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    return df
+@st.cache_resource
+def get_data() -> dashboard_data.DashboardData:
+    """Accès aux données et cache partagés par toutes les sessions (pas de copie par session)."""
+    return dashboard_data.DashboardData(engine, DASHBOARD_SOURCE, shared=shared_cache.from_env())
 
-covid_df = load_table('covid19_daily')
-mpox_df  = load_table('mpox')
+data = get_data()
 
 maladie = st.sidebar.radio("Maladie", ["COVID-19", "Mpox"], index=0)
-df_dates = covid_df if maladie == "COVID-19" else mpox_df
+table = 'covid19_daily' if maladie == 'COVID-19' else 'mpox'
 
-all_countries = sorted(df_dates['country'].dropna().unique())
+all_countries = data.countries(table)
 pays_sel = st.sidebar.multiselect("Pays", all_countries, default=all_countries[:3])
+first_date, last_date = data.date_bounds(table)
+periode = st.sidebar.date_input("Période", (first_date.date(), last_date.date()),
+                                min_value=first_date.date(), max_value=last_date.date())
+date_from, date_to = (periode if len(periode) == 2 else (periode[0], last_date.date()))
+
+# Seuls les pays et la période sélectionnés sont lus (requête filtrée, mise en cache)
+filtered_df = data.series(table, pays_sel, date_from, date_to)
+# KPI et carte : dernière ligne par pays à la fin de la période (vue
+# pré-agrégée si la période va jusqu'aux dernières données)
+latest_df = data.latest(table, pays_sel, date_to if date_to < last_date.date() else None)
+
+with st.sidebar.expander("Cache des données"):
+    cache_stats = data.metrics()
+    st.caption(f"Taux de hits : {cache_stats['hit_rate']:.0%} "
+               f"({cache_stats['hits']} hits, {cache_stats['misses']} misses)")
+    st.caption(f"{cache_stats['entries']} entrées, {cache_stats['size_mb']} / {cache_stats['max_mb']} Mo, "
+               f"{cache_stats['evictions']} évictions")
+    shared_stats = data.shared_metrics()
+    st.caption(f"Cache partagé ({shared_stats['backend']}) : {shared_stats['hit_rate']:.0%} de hits, "
+               f"{shared_stats['writes']} écritures, {shared_stats['errors']} erreurs")
 
-raw_df = covid_df if maladie == 'COVID-19' else mpox_df
-mask = raw_df['country'].isin(pays_sel)
-filtered_df = raw_df[mask]
-latest_df = filtered_df.sort_values('date').groupby('country', as_index=False).last()
+# --- Réduction des points des courbes (scripts/downsample.py) ---
+# Par graphique : méthode (lttb, resample, none) et nombre max de points par
+# série ; DASHBOARD_MAX_POINTS remplace le maximum de tous les graphiques.
+MAX_POINTS = os.getenv("DASHBOARD_MAX_POINTS")
+CHART_DECIMATION = {
+    "comparison":     {"method": "lttb", "max_points": 1000},
+    "details_cases":  {"method": "lttb", "max_points": 800},
+    "details_deaths": {"method": "resample", "max_points": 200, "agg": "last"},
+}
+
+def chart_window(chart: str):
+    """Fenêtre de dates affichée, dans la période choisie en barre latérale."""
+    if date_from >= date_to:
+        return date_from, date_to
+    return st.slider("Fenêtre affichée", min_value=date_from, max_value=date_to,
+                     value=(date_from, date_to), format="YYYY-MM-DD", key=f"window_{chart}")
+
+def chart_data(chart: str, countries, window, y: str) -> pd.DataFrame:
+    """
+    Série des pays sur la fenêtre, lue en pleine résolution (requête filtrée,
+    mise en cache) puis réduite selon CHART_DECIMATION avant Plotly.
+    """
+    settings = dict(CHART_DECIMATION[chart])
+    if MAX_POINTS:
+        settings["max_points"] = int(MAX_POINTS)
+    df = data.series(table, countries, window[0], window[1], columns=[y])
+    return downsample.decimate(df, 'date', y, group='country', **settings)
 
 # --- Accueil / KPI ---
 with tabs[0]:
@@ -212,7 +255,7 @@ with tabs[0]:
         unsafe_allow_html=True
     )
     st.divider()
-    st.caption("Ces indicateurs sont calculés sur tous les pays sélectionnés.")
+    st.caption(f"Ces indicateurs sont calculés sur tous les pays sélectionnés, au {date_to:%d/%m/%Y}.")
 
 # --- Visualisations avancées ---
 with tabs[1]:
@@ -285,17 +328,21 @@ with tabs[1]:
         countries = sorted(filtered_df['country'].dropna().unique())
         sel = st.multiselect("Sélectionner pays à comparer", countries, default=countries[:3])
         if sel:
-            comp_df = filtered_df[filtered_df['country'].isin(sel)]
+            window = chart_window("comparison")
+            comp_df = chart_data("comparison", sel, window, 'total_cases')
             fig = px.line(comp_df, x='date', y='total_cases', color='country', title='Évolution des cas',
                           color_discrete_sequence=custom_palette)
             st.plotly_chart(fig, use_container_width=True)
-            st.caption("Courbe d'évolution des cas pour les pays sélectionnés.")
+            st.caption("Courbe d'évolution des cas pour les pays sélectionnés. "
+                       "Réduisez la fenêtre affichée pour retrouver la pleine résolution.")
     elif visu_type == "Détails par pays":
         pays_unique = sorted(filtered_df['country'].unique())
         pays = st.selectbox("Pays", pays_unique)
-        filt = filtered_df[filtered_df['country'] == pays]
-        fig1 = px.area(filt, x='date', y='total_cases', title=f'Cas pour {pays}', color_discrete_sequence=["#f7b267"])
-        fig2 = px.bar(filt, x='date', y='total_deaths', title=f'Décès pour {pays}', color_discrete_sequence=["#fff"])
+        window = chart_window("details")
+        fig1 = px.area(chart_data("details_cases", [pays], window, 'total_cases'), x='date', y='total_cases',
+                       title=f'Cas pour {pays}', color_discrete_sequence=["#f7b267"])
+        fig2 = px.bar(chart_data("details_deaths", [pays], window, 'total_deaths'), x='date', y='total_deaths',
+                      title=f'Décès pour {pays}', color_discrete_sequence=["#fff"])
         st.plotly_chart(fig1, use_container_width=True)
         st.plotly_chart(fig2, use_container_width=True)
         st.caption(f"Détail des cas et décès pour {pays} sur tout l'historique.")
@@ -306,56 +353,30 @@ with tabs[2]:
     st.markdown("<div class='section-header'>Prédiction sur 3 mois </div>", unsafe_allow_html=True)
     st.info("Sélectionnez un pays et une variable à prédire. ")
 
-    pays_unique = sorted(raw_df['country'].unique())
-    pays = st.selectbox("Pays à prédire", pays_unique)
+    pays = st.selectbox("Pays à prédire", all_countries)
     variable = st.selectbox(
         "Variable à prédire",
         ["total_cases", "total_deaths", "total_recovered"],
         format_func=lambda x: {"total_cases":"Total cas", "total_deaths":"Total décès", "total_recovered":"Total guéris"}[x]
     )
 
-    # Forcer le type datetime sur la colonne d'origine (sécurité globale)
-    raw_df['date'] = pd.to_datetime(raw_df['date'], errors='coerce')
-
-    # Prend toutes les données du pays sélectionné, sans filtre de période
-    df_pred = raw_df[raw_df['country'] == pays][['date', variable]].dropna()
-    df_pred = df_pred.rename(columns={'date': 'ds', variable: 'y'})
-    df_pred = df_pred.sort_values('ds')
-
-    # Agrégation mensuelle pour tous les pays (même si déjà mensuel)
-    df_pred = df_pred.resample('M', on='ds').sum().reset_index()
-    df_pred = df_pred.sort_values('ds')
+    # Série mensuelle (36 derniers mois) sur tout l'historique du pays,
+    # préparée comme pour le calcul par lots
+    df_pred = forecasts.prepare_series(data.series(table, [pays], columns=[variable]), variable)
 
-    # Limite à 36 derniers points pour accélérer Prophet
-    if len(df_pred) > 36:
-        df_pred = df_pred.tail(36)
-
-    if len(df_pred) < 12:
+    if len(df_pred) < forecasts.MIN_MONTHS:
         st.warning("Pas assez de données pour entraîner Prophet (au moins 12 mois nécessaires).")
     else:
-        @st.cache_data(show_spinner="Calcul de la prédiction Prophet...")
-        def prophet_predict_fast(df_pred, periods=3):
-            model = Prophet(
-                yearly_seasonality=True,
-                weekly_seasonality=False,
-                daily_seasonality=False,
-                changepoint_prior_scale=0.05,
-                n_changepoints=10,
-                mcmc_samples=0
-            )
-            model.fit(df_pred)
-            future = model.make_future_dataframe(periods=periods, freq='MS')
-            forecast = model.predict(future)
-            forecast['yhat_smooth'] = forecast['yhat'].rolling(window=3, min_periods=1).mean()
-            return forecast
+        def prophet_predict_fast():
+            # Combinaison absente de la table `forecasts` : ajustement à la demande
+            with st.spinner("Calcul de la prédiction Prophet..."):
+                return forecasts.fit_forecast(df_pred, forecasts.PERIODS)
 
-        forecast = prophet_predict_fast(df_pred)
-        merged = pd.merge(df_pred, forecast[['ds', 'yhat']], on='ds', how='inner')
-        y_true = merged['y']
-        y_pred = merged['yhat']
-        mae = mean_absolute_error(y_true, y_pred)
-        mae_relative = mae / y_true.mean() if y_true.mean() else None
-        if mae_relative is not None:
+        # Précalculée, déjà en cache (ce réplica ou un autre), ou calculée ici
+        forecast = data.forecast(table, pays, variable, prophet_predict_fast)
+        mae = forecast['mae'].iloc[0]
+        mae_relative = forecast['mae_relative'].iloc[0]
+        if pd.notna(mae_relative):
             st.caption(f"MAE relative : {mae_relative:.5f}")
             mae_relative_str = f"{mae_relative:.5f}"
         else:
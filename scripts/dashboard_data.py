@@ -0,0 +1,262 @@
+# dashboard_data.py
+# Accès aux données du dashboard : requêtes paramétrées et filtrées (pays,
+# période, colonnes utiles) au lieu de SELECT * sur toute la table, et cache
+# partagé entre les sessions Streamlit :
+#   - borné en mémoire (octets des DataFrames) avec éviction LRU ;
+#   - TTL de sécurité, et clé incluant la version des données (table
+#     `data_versions`, incrémentée par store_data.py à chaque chargement) :
+#     un nouveau chargement invalide immédiatement les résultats en cache ;
+#   - compteurs de hits / misses / évictions affichés dans le dashboard ;
+#   - en second niveau, un cache partagé entre processus et réplicas
+#     (shared_cache.py : fichiers Arrow ou Redis), avec la même clé.
+# Les DataFrames renvoyés sont partagés : ne pas les modifier en place.
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import text
+
+import shared_cache
+
+COLUMNS = ["country_region", "date", "total_cases", "total_deaths", "total_recovered"]
+VALUE_COLUMNS = ["total_cases", "total_deaths", "total_recovered"]
+
+CACHE_MAX_MB = float(os.getenv("DASHBOARD_CACHE_MB", "256"))
+CACHE_TTL = float(os.getenv("DASHBOARD_CACHE_TTL", "600"))
+# Durée pendant laquelle la version lue en base est réutilisée sans requête
+VERSION_TTL = float(os.getenv("DASHBOARD_VERSION_TTL", "5"))
+
+class QueryCache:
+    """
+    Cache LRU de DataFrames borné en octets (memory_usage), avec TTL.
+    Partagé entre les threads des sessions Streamlit.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float = 0.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, size, stored_at = entry
+                if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                    del self._data[key]
+                    self.nbytes -= size
+                    self._stats["expired"] += 1
+                else:
+                    self._data.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key, df):
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._data[key] = (df, size, time.monotonic())
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted, _) = self._data.popitem(last=False)
+                self.nbytes -= evicted
+                self._stats["evictions"] += 1
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._data)
+            stats["size_mb"] = round(self.nbytes / 2**20, 2)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["max_mb"] = round(self.max_bytes / 2**20, 2)
+        return stats
+
+
+class DashboardData:
+    """
+    Requêtes du dashboard sur PostgreSQL (`engine`) ou sur le jeu Parquet
+    (`source="parquet"`), mises en cache selon (requête, paramètres, version).
+    """
+
+    def __init__(self, engine=None, source="db", cache=None, shared=None):
+        self.engine = engine
+        self.source = source
+        self.cache = cache or QueryCache(int(CACHE_MAX_MB * 2**20), CACHE_TTL)
+        self.shared = shared if shared is not None else shared_cache.SharedCache()
+        self._versions = {}
+
+    # -- Version des données --------------------------------------------
+    def data_version(self, table):
+        """Version courante de `table`, relue au plus toutes les VERSION_TTL secondes."""
+        cached = self._versions.get(table)
+        if cached and time.monotonic() - cached[1] < VERSION_TTL:
+            return cached[0]
+        if self.source == "parquet":
+            import parquet_store
+            # Une année réécrite (parquet_store) remplace son répertoire : son mtime change
+            path = parquet_store.dataset_path(table)
+            version = max([os.stat(path).st_mtime_ns] + [e.stat().st_mtime_ns for e in os.scandir(path)]) \
+                if os.path.isdir(path) else 0
+        else:
+            # Numéro et date de mise à jour : une base recréée ne réutilise
+            # pas les entrées partagées d'une ancienne base de même numéro
+            try:
+                with self.engine.connect() as conn:
+                    row = conn.execute(
+                        text("SELECT version, updated_at FROM data_versions WHERE table_name = :t"),
+                        {"t": table}
+                    ).first()
+                version = f"{row[0]}@{row[1].isoformat()}" if row else 0
+            except Exception:
+                version = 0  # table data_versions pas encore créée : TTL seul
+        self._versions[table] = (version, time.monotonic())
+        return version
+
+    def _cached(self, key, tables, load):
+        """Cache mémoire, puis cache partagé, puis `load()` ; la clé porte la version des tables."""
+        tables = (tables,) if isinstance(tables, str) else tables
+        key = tuple((t, self.data_version(t)) for t in tables) + key
+        df = self.cache.get(key)
+        if df is None:
+            df = self.shared.get(key)
+            if df is None:
+                df = load()
+                self.shared.set(key, df)
+            self.cache.set(key, df)
+        return df
+
+    # -- Requêtes -----------------------------------------------------------
+    def _query(self, sql, params):
+        df = pd.read_sql(text(sql), con=self.engine, params=params)
+        return _normalize(df)
+
+    def countries(self, table):
+        """Liste triée des pays de `table`."""
+        def load():
+            if self.source == "parquet":
+                import parquet_store
+                df = parquet_store.read_dataset(table, columns=["country_region"])
+                return pd.DataFrame({"country": sorted(df["country_region"].dropna().unique())})
+            return self._query(
+                f"SELECT DISTINCT country_region FROM {table} "
+                "WHERE country_region IS NOT NULL ORDER BY country_region", {}
+            )
+        return self._cached(("countries",), table, load)["country"].tolist()
+
+    def date_bounds(self, table):
+        """(première date, dernière date) de `table`."""
+        def load():
+            if self.source == "parquet":
+                import parquet_store
+                dates = parquet_store.read_dataset(table, columns=["date"])["date"]
+                return pd.DataFrame({"first": [dates.min()], "last": [dates.max()]})
+            return self._query(f"SELECT min(date) AS first, max(date) AS last FROM {table}", {})
+        bounds = self._cached(("bounds",), table, load)
+        return pd.Timestamp(bounds["first"].iloc[0]), pd.Timestamp(bounds["last"].iloc[0])
+
+    def series(self, table, countries, date_from=None, date_to=None, columns=VALUE_COLUMNS):
+        """Historique des pays demandés sur la période, colonnes `columns` uniquement."""
+        countries = tuple(sorted(countries))
+        columns = tuple(c for c in VALUE_COLUMNS if c in columns)
+        date_from = pd.Timestamp(date_from).date() if date_from is not None else None
+        date_to = pd.Timestamp(date_to).date() if date_to is not None else None
+        if not countries:
+            return pd.DataFrame(columns=["country", "date", *columns])
+
+        def load():
+            if self.source == "parquet":
+                import parquet_store
+                return _normalize(parquet_store.read_dataset(
+                    table, columns=["country_region", "date", *columns],
+                    countries=list(countries), date_from=date_from, date_to=date_to,
+                ))
+            where, params = ["country_region = ANY(:countries)"], {"countries": list(countries)}
+            if date_from is not None:
+                where.append("date >= :date_from")
+                params["date_from"] = date_from
+            if date_to is not None:
+                where.append("date <= :date_to")
+                params["date_to"] = date_to
+            return self._query(
+                f"SELECT country_region, date, {', '.join(columns)} FROM {table} "
+                f"WHERE {' AND '.join(where)} ORDER BY country_region, date", params
+            )
+        return self._cached(("series", countries, date_from, date_to, columns), table, load)
+
+    def latest(self, table, countries, date_to=None):
+        """
+        Dernière ligne de chaque pays demandé, au plus tard à `date_to` : vue
+        pré-agrégée <table>_latest (scripts/aggregates.py) si elle existe et
+        que la période va jusqu'aux dernières données (`date_to` None), sinon
+        DISTINCT ON sur la table.
+        """
+        countries = tuple(sorted(countries))
+        date_to = pd.Timestamp(date_to).date() if date_to is not None else None
+        if not countries:
+            return pd.DataFrame(columns=["country", "date", *VALUE_COLUMNS])
+
+        def load():
+            if self.source == "parquet":
+                df = self.series(table, countries, date_to=date_to)
+                return df.sort_values("date").groupby("country", as_index=False).last()
+            params = {"countries": list(countries)}
+            fallback = (
+                f"SELECT DISTINCT ON (country_region) {', '.join(COLUMNS)} FROM {table} "
+                "WHERE country_region = ANY(:countries) AND date IS NOT NULL "
+            )
+            if date_to is not None:
+                params["date_to"] = date_to
+                return self._query(
+                    fallback + "AND date <= :date_to ORDER BY country_region, date DESC", params
+                )
+            try:
+                return self._query(
+                    f"SELECT * FROM {table}_latest WHERE country_region = ANY(:countries) "
+                    "ORDER BY country_region", params
+                )
+            except Exception:
+                return self._query(fallback + "ORDER BY country_region, date DESC", params)
+        return self._cached(("latest", countries, date_to), table, load)
+
+    def forecast(self, table, country, variable, fit):
+        """
+        Prévision précalculée (table `forecasts`), sinon `fit()` : un
+        ajustement à la demande fait par un réplica sert aussi aux autres.
+        """
+        def load():
+            forecast = None
+            if self.source != "parquet":
+                import forecasts
+                try:
+                    forecast = forecasts.read_forecast(self.engine, table, country, variable)
+                except Exception:
+                    forecast = None  # table pas encore créée
+            return forecast if forecast is not None else fit()
+        return self._cached(("forecast", country, variable), (table, "forecasts"), load)
+
+    def metrics(self):
+        return self.cache.metrics()
+
+    def shared_metrics(self):
+        return self.shared.metrics()
+
+
+def _normalize(df):
+    """Colonnes au format du dashboard : `country`, dates en datetime."""
+    df = df.rename(columns={"country_region": "country"})
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    return df
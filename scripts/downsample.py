@@ -0,0 +1,91 @@
+# downsample.py
+# Réduction du nombre de points des courbes du dashboard avant Plotly :
+#   - lttb      : Largest-Triangle-Three-Buckets, garde les points qui
+#                 préservent la forme visuelle (pics, creux) ;
+#   - resample  : agrégation sur un pas de temps choisi selon la fenêtre
+#                 affichée (jour, semaine, mois, trimestre) ;
+#   - none      : série complète.
+# Une série qui tient déjà dans `max_points` n'est pas modifiée : en
+# réduisant la fenêtre affichée, on retrouve la pleine résolution.
+
+import numpy as np
+import pandas as pd
+
+# Pas de temps candidats pour `resample`, du plus fin au plus grossier
+# Alias "ME", "QE", "YE" : pandas >= 2.2 (requirements.txt)
+FREQUENCIES = ["D", "W", "ME", "QE", "YE"]
+
+
+def lttb(x, y, n_out):
+    """
+    Indices des `n_out` points retenus par LTTB (x croissant). Le premier
+    et le dernier point sont toujours gardés.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        # Moyenne du seau suivant : troisième sommet du triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Point du seau courant formant le plus grand triangle avec a et la moyenne
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.nanargmax(area)) if not np.isnan(area).all() else start
+        selected[i + 1] = a
+    return selected
+
+
+def pick_frequency(date_from, date_to, max_points):
+    """Pas de temps le plus fin donnant au plus `max_points` points sur la fenêtre."""
+    for freq in FREQUENCIES:
+        if len(pd.date_range(date_from, date_to, freq=freq)) <= max_points:
+            return freq
+    return FREQUENCIES[-1]
+
+
+def resample(df, x, y, max_points, agg="last"):
+    """
+    Agrège df sur le pas de temps adapté à sa fenêtre. `agg` vaut "last"
+    pour des cumuls (valeur en fin de période), "sum" ou "max" sinon.
+    """
+    if len(df) <= max_points:
+        return df
+    freq = pick_frequency(df[x].min(), df[x].max(), max_points)
+    return df.set_index(x)[y].resample(freq).agg(agg).dropna().reset_index()
+
+
+def decimate(df, x, y, max_points=1000, method="lttb", group=None, agg="last"):
+    """
+    Réduit chaque série de df (une par valeur de `group`, ou df entier) à
+    environ `max_points` points selon `method` (lttb, resample ou none).
+    Les colonnes hors `x`, `y`, `group` ne sont gardées qu'avec lttb.
+    """
+    if method == "none" or df.empty:
+        return df
+    groups = df.groupby(group, sort=False) if group else [(None, df)]
+    parts = []
+    for key, part in groups:
+        part = part.sort_values(x)
+        if method == "resample":
+            part = resample(part, x, y, max_points, agg)
+            if group and group not in part.columns:
+                part.insert(0, group, key)
+        else:
+            keep = part[y].notna().to_numpy()
+            part = part[keep]
+            xs = part[x].to_numpy(dtype="datetime64[ns]").astype(np.int64) \
+                if pd.api.types.is_datetime64_any_dtype(part[x]) else part[x].to_numpy()
+            part = part.iloc[lttb(xs, part[y].to_numpy(), max_points)]
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,246 @@
+# forecasts.py
+# Prévisions Prophet précalculées pour le dashboard : un modèle par
+# jeu de données x pays x variable, ajustés en parallèle (pool de processus)
+# après chaque chargement, et stockés dans la table `forecasts` avec leur MAE.
+# Le dashboard lit ces prévisions au lieu d'ajuster Prophet pendant la
+# requête, et ne recalcule à la demande que les combinaisons absentes.
+#
+#   python forecasts.py [--workers N] [--datasets covid19_daily mpox]
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2.extras import execute_values
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+
+DATASETS = ["covid19_daily", "mpox"]
+VARIABLES = ["total_cases", "total_deaths", "total_recovered"]
+# Mois prédits après la dernière date historique
+PERIODS = 3
+# Derniers points mensuels utilisés pour l'ajustement, et minimum requis
+HISTORY_MONTHS = 36
+MIN_MONTHS = 12
+
+CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS forecasts (
+        dataset        varchar(50)  NOT NULL,
+        country_region varchar(100) NOT NULL,
+        variable       varchar(50)  NOT NULL,
+        ds             date         NOT NULL,
+        yhat           double precision,
+        yhat_smooth    double precision,
+        mae            double precision,
+        mae_relative   double precision,
+        data_through   date,
+        computed_at    timestamptz  NOT NULL,
+        PRIMARY KEY (dataset, country_region, variable, ds)
+    )
+"""
+
+FORECAST_COLUMNS = ["ds", "yhat", "yhat_smooth", "mae", "mae_relative"]
+
+
+def monthly_series(df, variables=VARIABLES):
+    """
+    Séries mensuelles (ds, y) attendues par Prophet, pour chaque pays et
+    variable de `df` (colonnes country, date, variables) : somme par mois,
+    mois sans donnée à 0 entre la première et la dernière valeur connue,
+    limitée aux HISTORY_MONTHS derniers mois. Retourne {(pays, variable): série}.
+    Le regroupement est vectorisé : un seul passage pour tous les pays.
+    """
+    dates = pd.to_datetime(df['date'], errors='coerce')
+    month = (dates.dt.year * 12 + dates.dt.month - 1).rename('month')
+    monthly = (df[variables].groupby([df['country'], month]).sum(min_count=1)
+               .reset_index().sort_values(['country', 'month']))
+
+    series = {}
+    for country, group in monthly.groupby('country', sort=False):
+        months = group['month'].to_numpy(dtype='int64')
+        for variable in variables:
+            values = group[variable].to_numpy(dtype='float64')
+            known = ~np.isnan(values)
+            if not known.any():
+                continue
+            first, last = months[known].min(), months[known].max()
+            y = np.zeros(last - first + 1)
+            y[months[known] - first] = values[known]
+            first = max(first, last - HISTORY_MONTHS + 1)
+            y = y[-(last - first + 1):]
+            ds = pd.date_range(pd.Timestamp(year=int(first // 12), month=int(first % 12) + 1, day=1),
+                               periods=len(y), freq='ME')
+            series[(country, variable)] = pd.DataFrame({'ds': ds, 'y': y})
+    return series
+
+
+def prepare_series(df, variable):
+    """Série mensuelle (ds, y) d'un seul pays, ou série vide sans donnée."""
+    series = monthly_series(df, [variable])
+    return next(iter(series.values()), pd.DataFrame({'ds': pd.to_datetime([]), 'y': []}))
+
+
+def fit_forecast(series, periods=PERIODS):
+    """
+    Ajuste Prophet sur la série et retourne la prévision (ds, yhat,
+    yhat_smooth, mae, mae_relative) sur l'historique et les mois futurs.
+    """
+    from prophet import Prophet
+    from sklearn.metrics import mean_absolute_error
+
+    model = Prophet(
+        yearly_seasonality=True,
+        weekly_seasonality=False,
+        daily_seasonality=False,
+        changepoint_prior_scale=0.05,
+        n_changepoints=10,
+        mcmc_samples=0
+    )
+    model.fit(series)
+    future = model.make_future_dataframe(periods=periods, freq='MS')
+    forecast = model.predict(future)[['ds', 'yhat']]
+    forecast['yhat_smooth'] = forecast['yhat'].rolling(window=3, min_periods=1).mean()
+
+    merged = pd.merge(series, forecast, on='ds', how='inner')
+    mae = mean_absolute_error(merged['y'], merged['yhat']) if len(merged) else None
+    mean = merged['y'].mean() if len(merged) else 0
+    forecast['mae'] = mae
+    forecast['mae_relative'] = mae / mean if mae is not None and mean else None
+    return forecast[FORECAST_COLUMNS]
+
+
+def forecast_task(dataset, country, variable, series, periods=PERIODS):
+    """Tâche du pool : retourne (clé, prévision ou None, durée, erreur)."""
+    import logging
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    start = time.perf_counter()
+    try:
+        forecast = fit_forecast(series, periods)
+        error = None
+    except Exception as e:
+        forecast, error = None, str(e)
+    return (dataset, country, variable), forecast, time.perf_counter() - start, error
+
+
+def load_series(engine, dataset):
+    """Séries mensuelles {(pays, variable): série} d'une table."""
+    df = pd.read_sql_query(
+        f"SELECT country_region AS country, date, {', '.join(VARIABLES)} FROM {dataset}",
+        engine
+    )
+    return {key: s for key, s in monthly_series(df).items() if len(s) >= MIN_MONTHS}
+
+
+def save_forecasts(conn, results, data_through):
+    """
+    Remplace les prévisions des combinaisons recalculées, en une seule
+    transaction : le dashboard ne voit jamais une prévision incomplète.
+    """
+    computed_at = datetime.now(timezone.utc)
+    rows = []
+    for (dataset, country, variable), forecast in results.items():
+        for r in forecast.itertuples(index=False):
+            rows.append((dataset, country, variable, r.ds.date(),
+                         None if pd.isna(r.yhat) else float(r.yhat),
+                         None if pd.isna(r.yhat_smooth) else float(r.yhat_smooth),
+                         None if pd.isna(r.mae) else float(r.mae),
+                         None if pd.isna(r.mae_relative) else float(r.mae_relative),
+                         data_through.get((dataset, country)), computed_at))
+    with conn.cursor() as cur:
+        cur.execute(CREATE_SQL)
+        execute_values(cur, """
+            DELETE FROM forecasts f
+            USING (VALUES %s) AS k(dataset, country_region, variable)
+            WHERE f.dataset = k.dataset AND f.country_region = k.country_region
+              AND f.variable = k.variable
+        """, list(results))
+        execute_values(cur, f"""
+            INSERT INTO forecasts (dataset, country_region, variable, {', '.join(FORECAST_COLUMNS)},
+                                   data_through, computed_at)
+            VALUES %s
+        """, rows, page_size=5000)
+        # Nouvelle version : les prévisions en cache dans le dashboard sont périmées
+        from store_data import bump_version
+        bump_version(cur, "forecasts")
+    conn.commit()
+    return len(rows)
+
+
+def run_forecasts(database_url, datasets=DATASETS, workers=None, periods=PERIODS):
+    """
+    Calcule les prévisions de tous les pays x variables des jeux donnés dans
+    un pool de processus et les enregistre dans la table `forecasts`.
+    """
+    start = time.perf_counter()
+    engine = create_engine(database_url)
+    tasks, data_through = [], {}
+    for dataset in datasets:
+        for (country, variable), series in load_series(engine, dataset).items():
+            tasks.append((dataset, country, variable, series))
+            data_through[(dataset, country)] = series['ds'].max().date()
+    engine.dispose()
+    workers = workers or min(len(tasks), os.cpu_count() or 1) or 1
+    print(f"Prévisions : {len(tasks)} séries, {workers} processus")
+
+    results, failed, fit_time = {}, 0, 0.0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(forecast_task, *task, periods) for task in tasks]
+        for future in as_completed(futures):
+            key, forecast, elapsed, error = future.result()
+            fit_time += elapsed
+            if forecast is None:
+                failed += 1
+                print(f" Échec {'/'.join(key)} : {error}")
+            else:
+                results[key] = forecast
+
+    saved = 0
+    if results:
+        conn = psycopg2.connect(database_url)
+        try:
+            saved = save_forecasts(conn, results, data_through)
+        finally:
+            conn.close()
+    print(f"Prévisions terminées : {len(results)} séries ({failed} échecs), {saved} lignes "
+          f"en {time.perf_counter() - start:.2f}s (ajustements cumulés {fit_time:.1f}s)")
+    return len(results)
+
+
+def read_forecast(engine, dataset, country, variable):
+    """Prévision précalculée (colonnes de fit_forecast), ou None si absente."""
+    df = pd.read_sql_query(
+        f"""
+        SELECT {', '.join(FORECAST_COLUMNS)} FROM forecasts
+        WHERE dataset = %(dataset)s AND country_region = %(country)s AND variable = %(variable)s
+        ORDER BY ds
+        """,
+        engine, params={"dataset": dataset, "country": country, "variable": variable},
+    )
+    if df.empty:
+        return None
+    df['ds'] = pd.to_datetime(df['ds'])
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Précalcul des prévisions Prophet du dashboard")
+    parser.add_argument("--datasets", nargs="+", default=DATASETS, choices=DATASETS)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="nombre de processus (défaut : un par CPU)")
+    parser.add_argument("--periods", type=int, default=PERIODS, help="mois à prédire")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("La variable DATABASE_URL est manquante")
+    run_forecasts(database_url, args.datasets, args.workers, args.periods)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# forest_export.py
+# Export d'un RandomForestClassifier entraîné vers des tableaux NumPy plats,
+# lus par api/forest.py (CompactForest) sans scikit-learn ni unpickling :
+#   <dossier>/feature.npy    variable testée par nœud
+#   <dossier>/threshold.npy  seuil par nœud (float32)
+#   <dossier>/children.npy   (gauche, droite) par nœud, indices globaux
+#   <dossier>/value.npy      probabilités des classes par nœud
+#   <dossier>/roots.npy      nœud racine de chaque arbre
+#   <dossier>/meta.json      classes, nombre de variables, profondeur max...
+# Les feuilles pointent sur elles-mêmes : l'évaluation avance tous les arbres
+# d'un niveau à chaque pas, sans branchement, pendant `max_depth` pas.
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def float32_floor(threshold):
+    """
+    Plus grand float32 <= seuil. scikit-learn compare X converti en float32
+    au seuil float64 (x <= t) ; avec ce seuil arrondi vers le bas, la
+    comparaison en float32 donne exactement le même résultat.
+    """
+    t32 = threshold.astype(np.float32)
+    too_high = t32.astype(np.float64) > threshold
+    t32[too_high] = np.nextafter(t32[too_high], np.float32(-np.inf))
+    return t32
+
+
+def flatten_forest(clf):
+    """Concatène les arbres de la forêt en tableaux de nœuds."""
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in clf.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        nodes = np.arange(n)
+        left = np.where(is_leaf, nodes, tree.children_left) + offset
+        right = np.where(is_leaf, nodes, tree.children_right) + offset
+
+        value = tree.value[:, 0, :].astype(np.float64)
+        value = value / value.sum(axis=1, keepdims=True)
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        children.append(np.stack([left, right], axis=1))
+        values.append(value)
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    feature = np.concatenate(features)
+    return {
+        "feature": feature.astype(np.min_scalar_type(max(int(feature.max()), 0))),
+        "threshold": float32_floor(np.concatenate(thresholds)),
+        "children": np.concatenate(children).astype(np.int32),
+        "value": np.concatenate(values),
+        "roots": np.array(roots, dtype=np.int32),
+    }, max_depth
+
+
+def export_forest(clf, out_dir):
+    """
+    Écrit la forêt dans `out_dir` (dossier temporaire puis renommage) et
+    retourne ses métadonnées.
+    """
+    arrays, max_depth = flatten_forest(clf)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "n_features": int(clf.n_features_in_),
+        "classes": np.asarray(clf.classes_).tolist(),
+        "n_trees": len(clf.estimators_),
+        "n_nodes": int(len(arrays["threshold"])),
+        "max_depth": int(max_depth),
+    }
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return meta
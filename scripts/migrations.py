@@ -0,0 +1,425 @@
+# migrations.py
+# Migrations du schéma PostgreSQL de covid19_daily et mpox, appliquées une
+# seule fois et dans l'ordre ; la table `schema_migrations` garde la trace
+# de celles déjà passées. Chaque migration s'exécute dans sa propre
+# transaction.
+#   1  dédoublonnage des lignes (pays, date) : la plus récente (id max) reste
+#   2  contrainte unique (country_region, date), index composite qui inclut
+#      les compteurs : filtres pays + période, dernière ligne par pays et
+#      fusion du chargement (store_data.py) sans lecture de la table
+#   3  (--brin) index BRIN sur date, pour les filtres de période seuls
+#   4  (--partition) covid19_daily partitionnée par année (RANGE sur date) ;
+#      les années suivantes sont créées au chargement (store_data.py) ou par
+#      --maintain, en reprenant leurs lignes de la partition DEFAULT
+#
+#   python migrations.py [--brin] [--partition]   applique les migrations
+#   python migrations.py --status                 liste l'état des migrations
+#   python migrations.py --check                  vérifie les plans (EXPLAIN)
+#   python migrations.py --maintain               crée les partitions manquantes
+
+import argparse
+import json
+import os
+import sys
+from datetime import date
+
+import psycopg2
+from dotenv import load_dotenv
+
+TABLES = ["covid19_daily", "mpox"]
+PARTITIONED_TABLE = "covid19_daily"
+
+CREATE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version    integer      PRIMARY KEY,
+        name       varchar(100) NOT NULL,
+        applied_at timestamptz  NOT NULL DEFAULT now()
+    )
+"""
+
+
+def dedupe(cur):
+    for table in TABLES:
+        cur.execute(f"""
+            DELETE FROM {table} t
+            USING {table} newer
+            WHERE newer.country_region = t.country_region
+              AND newer.date = t.date
+              AND newer.id > t.id
+        """)
+        print(f" {table} : {cur.rowcount} doublons supprimés")
+
+
+def unique_country_date(cur):
+    for table in TABLES:
+        cur.execute(f"""
+            ALTER TABLE {table}
+            ADD CONSTRAINT {table}_country_date_key UNIQUE (country_region, date)
+            INCLUDE (total_cases, total_deaths, total_recovered)
+        """)
+
+
+def brin_date(cur):
+    for table in TABLES:
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {table}_date_brin ON {table} USING brin (date)")
+
+
+def partition_by_year(cur, table=PARTITIONED_TABLE):
+    """
+    Recrée `table` en table partitionnée par année (une partition par année
+    présente jusqu'à l'an prochain, plus une partition DEFAULT) et y copie
+    les lignes. Les vues pré-agrégées (aggregates.py), qui pointent sur
+    l'ancienne table, sont recréées. Les années suivantes sont ajoutées par
+    ensure_partition (chargement, ou --maintain).
+    """
+    import aggregates
+
+    cur.execute(f"SELECT min(date), max(date) FROM {table}")
+    first, last = cur.fetchone()
+    first_year = (first or date.today()).year
+    last_year = max((last or date.today()).year, date.today().year) + 1
+    sequence = f"{table}_id_seq"
+
+    cur.execute(f"""
+        CREATE TABLE {table}_partitioned (
+            id              integer NOT NULL DEFAULT nextval('{sequence}'),
+            country_region  varchar(100),
+            date            date,
+            total_cases     integer,
+            total_deaths    integer,
+            total_recovered integer,
+            PRIMARY KEY (id, date),
+            CONSTRAINT {table}_partitioned_country_date_key UNIQUE (country_region, date)
+                INCLUDE (total_cases, total_deaths, total_recovered)
+        ) PARTITION BY RANGE (date)
+    """)
+    for year in range(first_year, last_year + 1):
+        cur.execute(f"""
+            CREATE TABLE {table}_y{year} PARTITION OF {table}_partitioned
+            FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')
+        """)
+    cur.execute(f"CREATE TABLE {table}_default PARTITION OF {table}_partitioned DEFAULT")
+    cur.execute(f"""
+        INSERT INTO {table}_partitioned (id, country_region, date, total_cases, total_deaths, total_recovered)
+        SELECT id, country_region, date, total_cases, total_deaths, total_recovered FROM {table}
+        ORDER BY date, country_region
+    """)
+    print(f" {table} : {cur.rowcount} lignes copiées dans {last_year - first_year + 1} partitions annuelles")
+
+    # La séquence appartient à l'ancienne colonne id : la détacher avant le DROP
+    cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    for view in reversed(list(aggregates.VIEWS)):
+        cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS {aggregates.view_name(table, view)}")
+    cur.execute(f"DROP TABLE {table}")
+    cur.execute(f"ALTER TABLE {table}_partitioned RENAME TO {table}")
+    cur.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {table}_partitioned_pkey TO {table}_pkey")
+    cur.execute(f"""
+        ALTER TABLE {table} RENAME CONSTRAINT {table}_partitioned_country_date_key
+        TO {table}_country_date_key
+    """)
+    cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    cur.execute(f"SELECT count(*) FROM pg_indexes WHERE indexname = '{table}_date_brin'")
+    if cur.fetchone()[0] == 0 and has_migration(cur, 3):
+        cur.execute(f"CREATE INDEX {table}_date_brin ON {table} USING brin (date)")
+    aggregates.ensure_views(cur, table)
+
+
+def is_partitioned(cur, table):
+    cur.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", (table,))
+    return cur.fetchone() is not None
+
+
+def ensure_partition(cur, year, table=PARTITIONED_TABLE):
+    """
+    Crée la partition annuelle `year` de `table` si elle manque. PostgreSQL
+    refuse de la créer tant que la partition DEFAULT contient des lignes de
+    cette année : la DEFAULT est détachée, ses lignes de l'année déplacées
+    dans la nouvelle partition, puis rattachée. Retourne True si créée.
+    """
+    name = f"{table}_y{year}"
+    default = f"{table}_default"
+    # Deux chargements concurrents ne créent pas deux fois la même partition
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (table,))
+    cur.execute("SELECT to_regclass(%s), to_regclass(%s)", (name, default))
+    exists, has_default = (oid is not None for oid in cur.fetchone())
+    if exists:
+        return False
+    if has_default:
+        cur.execute(f"ALTER TABLE {table} DETACH PARTITION {default}")
+    cur.execute(f"""
+        CREATE TABLE {name} PARTITION OF {table}
+        FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')
+    """)
+    moved = 0
+    if has_default:
+        cur.execute(f"""
+            WITH moved AS (
+                DELETE FROM {default}
+                WHERE date >= '{year}-01-01' AND date < '{year + 1}-01-01'
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        """)
+        moved = cur.rowcount
+        cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT")
+    print(f" {table} : partition {name} créée ({moved} lignes reprises de {default})")
+    return True
+
+
+def ensure_partitions(cur, years, table=PARTITIONED_TABLE):
+    """Partitions des années données ; sans effet si `table` n'est pas partitionnée."""
+    if not years or not is_partitioned(cur, table):
+        return
+    for year in sorted(set(years)):
+        ensure_partition(cur, year, table)
+
+
+def maintain_partitions(database_url, table=PARTITIONED_TABLE):
+    """
+    Crée à l'avance la partition de l'an prochain et celles des années
+    arrivées dans la partition DEFAULT (insertions de l'API par exemple).
+    """
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cur:
+            if not is_partitioned(cur, table):
+                print(f"{table} n'est pas partitionnée (migrations.py --partition)")
+                return
+            cur.execute(f"""
+                SELECT DISTINCT extract(year FROM date)::int FROM {table}_default
+                WHERE date IS NOT NULL
+            """)
+            years = [row[0] for row in cur.fetchall()] + [date.today().year + 1]
+            ensure_partitions(cur, years, table)
+    finally:
+        conn.close()
+
+
+# (version, nom, fonction, option requise ou None)
+MIGRATIONS = [
+    (1, "dedupe_country_date", dedupe, None),
+    (2, "unique_country_date", unique_country_date, None),
+    (3, "brin_date", brin_date, "brin"),
+    (4, "partition_covid19_daily_by_year", partition_by_year, "partition"),
+]
+
+
+def has_migration(cur, version):
+    cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+    return cur.fetchone() is not None
+
+
+def applied_versions(cur):
+    cur.execute(CREATE_SQL)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def pending(applied, options=()):
+    """Migrations à appliquer : non appliquées, et demandées si optionnelles."""
+    return [m for m in MIGRATIONS if m[0] not in applied and (m[3] is None or m[3] in options)]
+
+
+def migrate(database_url, options=()):
+    """Applique dans l'ordre les migrations en attente, une transaction chacune."""
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cur:
+            todo = pending(applied_versions(cur), options)
+        if not todo:
+            print("Schéma à jour.")
+        for version, name, apply, _ in todo:
+            print(f"Migration {version} : {name}")
+            with conn, conn.cursor() as cur:
+                apply(cur)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                            (version, name))
+    finally:
+        conn.close()
+
+
+def status(database_url):
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cur:
+            applied = applied_versions(cur)
+    finally:
+        conn.close()
+    for version, name, _, option in MIGRATIONS:
+        state = "appliquée" if version in applied else (f"optionnelle (--{option})" if option else "en attente")
+        print(f" {version:>3}  {name:<34} {state}")
+
+
+# -- Vérification des plans ----------------------------------------------------
+# Requêtes représentatives de l'API, du dashboard et du chargement, avec les
+# index acceptés (suffixes de nom, préfixés par la table) ; ABSENT si le
+# premier n'existe pas (migration optionnelle non appliquée).
+CHECK_QUERIES = [
+    ("API : pays + période", """
+        SELECT id, country_region, date, total_cases FROM {table}
+        WHERE country_region = ANY(%(countries)s) AND date >= %(date_from)s AND date <= %(date_to)s
+        ORDER BY id LIMIT 101
+    """, ["_country_date_key"]),
+    ("dashboard : séries des pays", """
+        SELECT country_region, date, total_cases FROM {table}
+        WHERE country_region = ANY(%(countries)s) AND date >= %(date_from)s
+        ORDER BY country_region, date
+    """, ["_country_date_key"]),
+    ("dernière ligne par pays", """
+        SELECT DISTINCT ON (country_region) country_region, date, total_cases, total_deaths, total_recovered
+        FROM {table} WHERE country_region = ANY(%(countries)s)
+        ORDER BY country_region, date DESC
+    """, ["_country_date_key"]),
+    ("chargement : ligne (pays, date) existante", """
+        SELECT 1 FROM {table} WHERE country_region = %(country)s AND date = %(date_to)s
+    """, ["_country_date_key"]),
+    ("période seule", """
+        SELECT country_region, date, total_cases FROM {table}
+        WHERE date >= %(date_from)s AND date <= %(date_to)s
+    """, ["_date_brin", "_country_date_key"]),  # petite table : le BRIN ne bat pas la clé
+]
+
+
+def plan_nodes(plan):
+    """Parcourt récursivement un plan EXPLAIN (FORMAT JSON)."""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def plan_indexes(plan):
+    """Noms des index utilisés par le plan."""
+    return {node["Index Name"] for node in plan_nodes(plan) if "Index Name" in node}
+
+
+def plan_seq_scans(plan):
+    """Relations lues séquentiellement par le plan."""
+    return {node["Relation Name"] for node in plan_nodes(plan) if node["Node Type"] == "Seq Scan"}
+
+
+def plan_relations(plan):
+    """Tables (ou partitions) lues par le plan."""
+    return {node["Relation Name"] for node in plan_nodes(plan) if "Relation Name" in node}
+
+
+def index_family(cur, names):
+    """Index donnés et, pour une table partitionnée, leurs index de partition."""
+    cur.execute("""
+        SELECT child.relname
+        FROM pg_inherits i
+        JOIN pg_class child  ON child.oid = i.inhrelid
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        WHERE parent.relname = ANY(%s)
+    """, (list(names),))
+    return set(names) | {row[0] for row in cur.fetchall()}
+
+
+def explain(cur, query, params):
+    cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+    result = cur.fetchone()[0]
+    return (json.loads(result) if isinstance(result, str) else result)[0]["Plan"]
+
+
+def short_list(names):
+    names = sorted(names)
+    return ", ".join(names[:2]) + (f" (+{len(names) - 2})" if len(names) > 2 else "") or "aucun"
+
+
+def check_plans(database_url, tables=TABLES):
+    """
+    Pour chaque requête représentative, vérifie que le plan choisi par
+    PostgreSQL (statistiques à jour) utilise l'index attendu ; sur une table
+    partitionnée, lire une seule partition (élagage) compte aussi. En cas
+    d'échec, le plan obtenu avec enable_seqscan=off est affiché en diagnostic
+    (index utilisable mais jugé plus cher, ou inutilisable) sans changer le
+    verdict. Retourne le nombre de requêtes sans index attendu.
+    """
+    conn = psycopg2.connect(database_url)
+    failures = 0
+    try:
+        with conn.cursor() as cur:
+            for table in tables:
+                # Date médiane du pays le plus fourni : une période typique, pas
+                # une année presque vide (dernière partition créée)
+                cur.execute(f"""
+                    SELECT country_region, min(date), percentile_disc(0.5) WITHIN GROUP (ORDER BY date)
+                    FROM {table}
+                    WHERE country_region IS NOT NULL AND date IS NOT NULL
+                    GROUP BY country_region ORDER BY count(*) DESC LIMIT 3
+                """)
+                sample = cur.fetchall()
+                if not sample:
+                    print(f"{table} : vide, vérification ignorée")
+                    continue
+                cur.execute(f"ANALYZE {table}")
+                cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+                partitioned = cur.fetchone()[0]
+                cur.execute("SELECT relname FROM pg_class WHERE relkind IN ('i', 'I')")
+                existing = {row[0] for row in cur.fetchall()}
+                params = {
+                    "countries": [row[0] for row in sample],
+                    "country": sample[0][0],
+                    "date_from": sample[0][2].replace(day=1),
+                    "date_to": sample[0][2],
+                }
+                print(f"\n{table}")
+                for label, query, expected in CHECK_QUERIES:
+                    expected = [f"{table}{suffix}" for suffix in expected]
+                    query = query.format(table=table)
+                    natural = explain(cur, query, params)
+                    used = plan_indexes(natural)
+                    read = plan_relations(natural)
+                    if expected[0] not in existing:
+                        state = "ABSENT"  # migration optionnelle non appliquée
+                    elif used & index_family(cur, expected):
+                        state = "OK"
+                    elif partitioned and len(read) == 1:
+                        state = "OK"
+                        used = {f"élagage : {read.pop()}"}
+                    else:
+                        state = "ÉCHEC"
+                        failures += 1
+                    seq = plan_seq_scans(natural)
+                    print(f" {state:<8} {label:<44} plan : {natural['Node Type']}"
+                          f"{', parcours séquentiel ' + ', '.join(sorted(seq)) if seq else ''}"
+                          f" ; index : {short_list(used)}")
+                    if state == "ÉCHEC":
+                        cur.execute("SET enable_seqscan = off")
+                        forced = explain(cur, query, params)
+                        cur.execute("RESET enable_seqscan")
+                        print(f" {'':<8} {'(diagnostic) enable_seqscan=off':<44} index : "
+                              f"{short_list(plan_indexes(forced))}")
+    finally:
+        conn.close()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrations du schéma et vérification des index")
+    parser.add_argument("--brin", action="store_true", help="ajouter l'index BRIN sur date")
+    parser.add_argument("--partition", action="store_true",
+                        help="partitionner covid19_daily par année")
+    parser.add_argument("--status", action="store_true", help="afficher l'état des migrations")
+    parser.add_argument("--check", action="store_true",
+                        help="vérifier (EXPLAIN) que les requêtes utilisent les index")
+    parser.add_argument("--maintain", action="store_true",
+                        help="créer les partitions annuelles manquantes de covid19_daily")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("La variable DATABASE_URL est manquante")
+    if args.status:
+        status(database_url)
+    elif args.check:
+        sys.exit(1 if check_plans(database_url) else 0)
+    elif args.maintain:
+        maintain_partitions(database_url)
+    else:
+        options = [name for name in ("brin", "partition") if getattr(args, name)]
+        migrate(database_url, options)
+
+
+if __name__ == "__main__":
+    main()
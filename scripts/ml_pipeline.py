@@ -1,71 +1,369 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows : pas de RSS max ni de CPU des processus enfants
+    resource = None
+
+FEATURES = ['total_deaths', 'total_recovered']
+# Cible : le pays dépasse ce nombre de cas
+CASES_THRESHOLD = 10000
+# Lignes lues par aller-retour avec la base
+TRAIN_CHUNK_SIZE = 50_000
+
+# Projection et cible calculées par PostgreSQL : seules trois colonnes
+# numériques transitent, sans pays ni dates
+TRAIN_WHERE = "total_cases IS NOT NULL AND total_deaths IS NOT NULL AND total_recovered IS NOT NULL"
+TRAIN_COUNT_SQL = f"SELECT count(*) FROM covid19_daily WHERE {TRAIN_WHERE}"
+TRAIN_SQL = f"""
+    SELECT total_deaths, total_recovered, (total_cases > %(threshold)s)::int
+    FROM covid19_daily
+    WHERE {TRAIN_WHERE}
+"""
+
+# Paramètres du modèle hors recherche
+DEFAULT_PARAMS = {}
+# Grille explorée avec TRAIN_SEARCH=1 (remplaçable par TRAIN_PARAM_GRID, en JSON)
+PARAM_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [None, 8, 16],
+    "min_samples_leaf": [1, 3],
+}
+
+
+def data_fingerprint(X, y):
+    """Empreinte des données d'entraînement (valeurs, types et dimensions)."""
+    import numpy as np
+    h = hashlib.sha256()
+    for array in (np.ascontiguousarray(X), np.ascontiguousarray(y)):
+        h.update(f"{array.dtype}{array.shape}".encode())
+        h.update(array.tobytes())
+    return h.hexdigest()[:16]
+
+
+def load_training_data_db(database_url, chunksize=TRAIN_CHUNK_SIZE):
+    """
+    Lit (X, y) depuis PostgreSQL par morceaux (curseur serveur) directement
+    dans des tableaux NumPy préalloués : X en float32 (le type utilisé par
+    les arbres de scikit-learn), y en int8.
+    """
+    import numpy as np
+    import psycopg2
+    conn = psycopg2.connect(database_url)
+    try:
+        # Un seul instantané : le comptage et la lecture voient les mêmes lignes
+        conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+        with conn.cursor() as cur:
+            cur.execute(TRAIN_COUNT_SQL)
+            n_rows = cur.fetchone()[0]
+        X = np.empty((n_rows, len(FEATURES)), dtype=np.float32)
+        y = np.empty(n_rows, dtype=np.int8)
+        with conn.cursor(name="training_data") as cur:
+            cur.itersize = chunksize
+            cur.execute(TRAIN_SQL, {"threshold": CASES_THRESHOLD})
+            pos = 0
+            while True:
+                rows = cur.fetchmany(chunksize)
+                if not rows:
+                    break
+                chunk = np.array(rows, dtype=np.float64)
+                X[pos:pos + len(chunk)] = chunk[:, :-1]
+                y[pos:pos + len(chunk)] = chunk[:, -1]
+                pos += len(chunk)
+    finally:
+        conn.close()
+    return X, y
+
+
+def load_training_data_parquet():
+    """Même résultat que load_training_data_db, depuis le jeu Parquet nettoyé."""
+    import numpy as np
+    import parquet_store
+    df = parquet_store.read_dataset(
+        "covid19_daily", columns=['total_cases', *FEATURES]
+    ).dropna()
+    X = df[FEATURES].to_numpy(dtype=np.float32)
+    y = (df['total_cases'].to_numpy() > CASES_THRESHOLD).astype(np.int8)
+    return X, y
+
+
+def training_key(fingerprint, params):
+    """Clé d'un entraînement : données + paramètres (ou grille) + version de scikit-learn."""
+    import sklearn
+    payload = json.dumps({"data": fingerprint, "params": params, "sklearn": sklearn.__version__},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def cv_score(params, fingerprint, X, y, n_splits):
+    """F1 moyen en cross-validation ; mis en cache par (params, fingerprint, n_splits)."""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import cross_val_score
+    clf = RandomForestClassifier(random_state=42, **params)
+    return float(cross_val_score(clf, X, y, cv=n_splits, scoring='f1').mean())
+
+
+def fit_final(params, fingerprint, X, y, n_jobs):
+    """Entraînement final ; mis en cache par (params, fingerprint)."""
+    from sklearn.ensemble import RandomForestClassifier
+    clf = RandomForestClassifier(random_state=42, n_jobs=n_jobs, **params)
+    clf.fit(X, y)
+    # Le modèle servi prédit ligne par ligne : pas de pool de threads à l'inférence
+    clf.n_jobs = None
+    return clf
+
+
+def search_params(grid, fingerprint, X, y, n_splits, n_jobs, memory):
+    """
+    Évalue chaque combinaison de la grille en parallèle (processus joblib).
+    Les scores déjà calculés pour les mêmes données sont relus du cache.
+    Retourne (meilleurs paramètres, F1 moyen).
+    """
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import ParameterGrid
+    cached_cv = memory.cache(cv_score, ignore=["X", "y"])
+    candidates = list(ParameterGrid(grid))
+    scores = Parallel(n_jobs=n_jobs)(
+        delayed(cached_cv)(params, fingerprint, X, y, n_splits) for params in candidates
+    )
+    for params, score in sorted(zip(candidates, scores), key=lambda c: -c[1]):
+        print(f"  F1 {score:.3f}  {params}")
+    best = max(range(len(scores)), key=lambda i: scores[i])
+    return candidates[best], scores[best]
+
+
+def max_rss_mb():
+    """RSS max du processus en Mo, None si le module resource est absent."""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def children_cpu_s():
+    """Temps CPU des processus enfants terminés, None si le module resource est absent."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _fmt(value, width, digits):
+    return f"{'-':>{width}}" if value is None else f"{value:>{width}.{digits}f}"
+
+
+class StageReport:
+    """
+    Mesures par étape de l'entraînement : durée, temps CPU (processus et
+    processus enfants terminés), RSS max du processus à la fin de l'étape
+    et nombre de lignes traitées. Écrit en JSON à côté du modèle. Sans le
+    module resource (Windows), CPU enfants et RSS valent None.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        info = {"name": name, "rows": rows}
+        wall, cpu = time.perf_counter(), time.process_time()
+        children = children_cpu_s()
+        try:
+            yield info
+        finally:
+            info["wall_s"] = round(time.perf_counter() - wall, 4)
+            info["cpu_s"] = round(time.process_time() - cpu, 4)
+            info["children_cpu_s"] = None if children is None \
+                else round(max(0.0, children_cpu_s() - children), 4)
+            info["max_rss_mb"] = max_rss_mb()
+            self.stages.append(info)
+
+    def to_dict(self, **extra):
+        return {
+            "started_at": self.started_at.isoformat(),
+            "total_wall_s": round(time.perf_counter() - self.start, 4),
+            "total_cpu_s": round(time.process_time(), 4),
+            "max_rss_mb": max_rss_mb(),
+            **extra,
+            "stages": self.stages,
+        }
+
+    def write(self, path, **extra):
+        report = self.to_dict(**extra)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(report, f, indent=1)
+        os.replace(tmp_path, path)
+        print(f"\n{'étape':<14}{'durée s':>9}{'CPU s':>8}{'CPU enfants s':>15}{'RSS max Mo':>12}{'lignes':>9}")
+        for st in self.stages:
+            rows = "" if st["rows"] is None else st["rows"]
+            print(f"{st['name']:<14}{st['wall_s']:>9.3f}{st['cpu_s']:>8.3f}"
+                  f"{_fmt(st['children_cpu_s'], 15, 3)}{_fmt(st['max_rss_mb'], 12, 1)}{rows:>9}")
+        print(f"Rapport de temps écrit dans {path}")
+
+
 def train_model():
-    import os
+    import numpy as np
     import pandas as pd
-    from sqlalchemy import create_engine
     from dotenv import load_dotenv
-    from sklearn.model_selection import train_test_split, cross_val_score
-    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import train_test_split
     from sklearn.metrics import accuracy_score, f1_score, classification_report
     from imblearn.over_sampling import SMOTE
+    from joblib import Memory
     import joblib
+    import model_registry
 
-    # 1. Connexion à la base et extraction des données
-    load_dotenv()
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    engine = create_engine(DATABASE_URL)
+    report = StageReport()
+    # Rapport de la dernière exécution ; copié à côté de l'artefact publié
+    report_path = os.getenv("TRAIN_REPORT", os.path.join(model_registry.registry_dir, "last_run.timings.json"))
 
-    query = """
-    SELECT * FROM covid19_daily
-    WHERE total_cases IS NOT NULL AND total_deaths IS NOT NULL AND total_recovered IS NOT NULL
-    """
-    df = pd.read_sql(query, engine)
-    df['target'] = (df['total_cases'] > 10000).astype(int)
+    # 1. Extraction des données : base PostgreSQL, ou jeu Parquet nettoyé
+    #    (TRAIN_SOURCE=parquet) ; seules les variables utiles et la cible sont lues
+    load_dotenv()
+    with report.stage("extraction") as st:
+        tracemalloc.start()
+        if os.getenv("TRAIN_SOURCE", "db") == "parquet":
+            X, y = load_training_data_parquet()
+        else:
+            X, y = load_training_data_db(os.getenv("DATABASE_URL"),
+                                         int(os.getenv("TRAIN_CHUNK_SIZE", TRAIN_CHUNK_SIZE)))
+        load_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        st["rows"] = len(y)
+        st["load_peak_mb"] = round(load_peak / 2**20, 2)
+    if len(y) == 0:
+        raise RuntimeError("Aucune donnée d'entraînement")
 
-    print(f"Nombre de lignes extraites de la base : {len(df)}")
-    print(df[['total_cases', 'total_deaths', 'total_recovered']].describe())
+    rss = max_rss_mb()
+    print(f"Nombre de lignes extraites : {len(y)} "
+          f"(pic mémoire au chargement {load_peak / 2**20:.1f} Mo"
+          f"{f', RSS max {rss:.0f} Mo' if rss is not None else ''})")
+    for i, name in enumerate(FEATURES):
+        print(f"  {name} : min {X[:, i].min():.0f}, moyenne {X[:, i].mean():.0f}, max {X[:, i].max():.0f}")
     print("Distribution de la cible (target) :")
-    print(df['target'].value_counts())
+    print(dict(enumerate(np.bincount(y).tolist())))
+
+    features = FEATURES
 
-    features = ['total_deaths', 'total_recovered']
-    X = df[features]
-    y = df['target']
+    # 2. Rien à faire si le modèle courant a été entraîné sur les mêmes
+    #    données avec les mêmes paramètres (TRAIN_FORCE=1 pour réentraîner)
+    search = os.getenv("TRAIN_SEARCH", "0") == "1"
+    grid = json.loads(os.getenv("TRAIN_PARAM_GRID", "null")) or PARAM_GRID
+    n_jobs = int(os.getenv("TRAIN_N_JOBS", "-1"))
+    with report.stage("fingerprint", rows=len(y)):
+        fingerprint = data_fingerprint(X, y)
+        key = training_key(fingerprint, {"grid": grid} if search else DEFAULT_PARAMS)
+    current = model_registry.current()
+    if current and current.get("training_key") == key and os.getenv("TRAIN_FORCE", "0") != "1":
+        print(f"Données et paramètres inchangés (clé {key}) : "
+              f"modèle {current['version']} conservé, pas de réentraînement.")
+        report.write(report_path, skipped=True, version=current["version"])
+        return joblib.load(os.path.join(model_registry.registry_dir, current["file"]))
 
     # 3. Équilibrage des classes (optionnel)
-    smote = SMOTE(random_state=42)
-    X_res, y_res = smote.fit_resample(X, y)
+    with report.stage("smote", rows=len(y)) as st:
+        smote = SMOTE(random_state=42)
+        X_res, y_res = smote.fit_resample(X, y)
+        st["rows_out"] = len(y_res)
 
     # 4. Split 60% train / 40% test
-    X_train, X_test, y_train, y_test = train_test_split(X_res, y_res, test_size=0.2, random_state=42, stratify=y_res)
+    with report.stage("split", rows=len(y_res)):
+        X_train, X_test, y_train, y_test = train_test_split(X_res, y_res, test_size=0.2, random_state=42, stratify=y_res)
 
-    # 5. Cross-validation sur le train
-    clf = RandomForestClassifier(random_state=42)
+    # 5. Cross-validation (ou recherche d'hyperparamètres) sur le train, en
+    #    parallèle ; scores et modèles mis en cache selon l'empreinte des données
+    memory = Memory(os.getenv("TRAIN_CACHE_DIR", os.path.join(model_registry.registry_dir, ".train_cache")),
+                    verbose=0)
+    params, cv_f1 = dict(DEFAULT_PARAMS), None
     n_splits = min(5, len(X_train))
-    if n_splits > 1:
-        cross_val = cross_val_score(clf, X_train, y_train, cv=n_splits, scoring='f1')
-        print(f"F1-score cross-validation (train): {cross_val.mean():.3f}")
-    else:
-        print("Pas assez d'échantillons pour la cross-validation.")
+    with report.stage("search" if search else "cross_val", rows=len(y_train)):
+        if n_splits > 1 and search:
+            print(f"Recherche d'hyperparamètres ({n_jobs} processus) :")
+            params, cv_f1 = search_params(grid, fingerprint, X_train, y_train, n_splits, n_jobs, memory)
+            print(f"Meilleurs paramètres : {params} (F1 cross-validation {cv_f1:.3f})")
+        elif n_splits > 1:
+            cv_f1 = memory.cache(cv_score, ignore=["X", "y"])(params, fingerprint, X_train, y_train, n_splits)
+            print(f"F1-score cross-validation (train): {cv_f1:.3f}")
+        else:
+            print("Pas assez d'échantillons pour la cross-validation.")
     # 6. Entraînement du modèle
-    clf.fit(X_train, y_train)
+    with report.stage("fit", rows=len(y_train)):
+        clf = memory.cache(fit_final, ignore=["X", "y", "n_jobs"])(params, fingerprint, X_train, y_train, n_jobs)
 
     # 7. Évaluation sur le test
-    y_pred = clf.predict(X_test)
+    with report.stage("evaluate", rows=len(y_test)):
+        y_pred = clf.predict(X_test)
     print("Accuracy:", accuracy_score(y_test, y_pred))
     print("F1-score:", f1_score(y_test, y_pred))
     print(classification_report(y_test, y_pred))
 
-    # 8. Sauvegarde du modèle
-    joblib.dump(clf, "model_covid_rf.joblib")
+    # 8. Sauvegarde du modèle : nouvelle version dans le registre (lue par
+    #    l'API sans redémarrage), et copie historique model_covid_rf.joblib
+    #    écrite de façon atomique
+    import sklearn
+    with report.stage("publish"):
+        meta = model_registry.publish(clf, {
+            "features": features,
+            "params": params,
+            "cv_f1": cv_f1,
+            "data_fingerprint": fingerprint,
+            "training_key": key,
+            "n_rows": int(len(y)),
+            "accuracy": float(accuracy_score(y_test, y_pred)),
+            "f1": float(f1_score(y_test, y_pred)),
+            "sklearn_version": sklearn.__version__,
+        })
+    with report.stage("joblib_dump"):
+        joblib.dump(clf, "model_covid_rf.joblib.tmp")
+        os.replace("model_covid_rf.joblib.tmp", "model_covid_rf.joblib")
     print("Modèle sauvegardé sous model_covid_rf.joblib")
 
     # 9. (Optionnel) Export des résultats de test dans un CSV
-    results = pd.DataFrame({
-        "y_true": y_test,
-        "y_pred": y_pred
-    })
-    results.to_csv("rf_test_results.csv", index=False)
+    with report.stage("export_csv", rows=len(y_test)):
+        results = pd.DataFrame({
+            "y_true": y_test,
+            "y_pred": y_pred
+        })
+        results.to_csv("rf_test_results.csv", index=False)
     print("Résultats de test exportés dans rf_test_results.csv")
 
+    report.write(report_path, skipped=False, version=meta["version"])
+    shutil.copyfile(report_path, os.path.join(
+        model_registry.registry_dir, f"{model_registry.MODEL_NAME}-{meta['version']}.timings.json"))
+
     return clf  # ou return True si tu veux juste valider l'exécution
+
+
+def main():
+    """
+    TRAIN_PROFILE=<fichier.prof> : exécute l'entraînement sous cProfile et
+    enregistre les statistiques (lisibles avec pstats ou snakeviz).
+    Pour un profil par échantillonnage sans modifier le code :
+    py-spy record -o profil.svg -- python ml_pipeline.py
+    """
+    profile_path = os.getenv("TRAIN_PROFILE")
+    if not profile_path:
+        train_model()
+        return
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(train_model)
+    finally:
+        profiler.dump_stats(profile_path)
+        print(f"Profil cProfile enregistré dans {profile_path}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
+
 if __name__ == "__main__":
-    train_model()
\ No newline at end of file
+    main()
@@ -0,0 +1,105 @@
+# model_registry.py
+# Registre versionné des modèles entraînés :
+#   models/model_covid_rf-<version>.joblib   artefact (jamais réécrit)
+#   models/model_covid_rf-<version>.json     métadonnées
+#   models/model_covid_rf-<version>.forest/  forêt exportée en tableaux NumPy
+#                                            (forest_export.py), si applicable
+#   models/current.json                      pointeur vers la version servie
+# Chaque fichier est écrit dans un fichier temporaire puis renommé
+# (os.replace) : un lecteur ne voit jamais un fichier à moitié écrit, et le
+# pointeur n'est mis à jour qu'une fois l'artefact complet sur disque.
+
+import hashlib
+import io
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import joblib
+
+registry_dir = os.getenv("MODEL_REGISTRY_DIR", os.path.join(os.getcwd(), "models"))
+MODEL_NAME = "model_covid_rf"
+CURRENT_FILE = "current.json"
+KEEP_VERSIONS = 5
+
+
+def atomic_write(path, data: bytes):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def current(root=registry_dir):
+    """Métadonnées de la version courante, ou None si le registre est vide."""
+    path = os.path.join(root, CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def publish(model, metadata=None, root=registry_dir, name=MODEL_NAME, keep=KEEP_VERSIONS):
+    """Enregistre une nouvelle version du modèle et en fait la version courante."""
+    os.makedirs(root, exist_ok=True)
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    data = buffer.getvalue()
+    sha256 = hashlib.sha256(data).hexdigest()
+    created_at = datetime.now(timezone.utc)
+    version = f"{created_at:%Y%m%dT%H%M%SZ}-{sha256[:8]}"
+
+    filename = f"{name}-{version}.joblib"
+    atomic_write(os.path.join(root, filename), data)
+    meta = {
+        "version": version,
+        "file": filename,
+        "sha256": sha256,
+        "created_at": created_at.isoformat(),
+        **(metadata or {}),
+    }
+    if hasattr(model, "estimators_"):
+        import forest_export
+        forest_dir = f"{name}-{version}.forest"
+        meta["forest"] = forest_dir
+        meta["forest_meta"] = forest_export.export_forest(model, os.path.join(root, forest_dir))
+    meta_bytes = json.dumps(meta, indent=1).encode()
+    atomic_write(os.path.join(root, f"{name}-{version}.json"), meta_bytes)
+    atomic_write(os.path.join(root, CURRENT_FILE), meta_bytes)
+    prune(root, name, keep)
+    print(f"Modèle publié : {os.path.join(root, filename)} (version {version})")
+    return meta
+
+
+def created_at(root, name, version) -> float:
+    """Date de création d'une version (métadonnées), à défaut celle de l'artefact."""
+    try:
+        with open(os.path.join(root, f"{name}-{version}.json")) as f:
+            return datetime.fromisoformat(json.load(f)["created_at"]).timestamp()
+    except (OSError, ValueError, KeyError):
+        return os.path.getmtime(os.path.join(root, f"{name}-{version}.joblib"))
+
+
+def prune(root=registry_dir, name=MODEL_NAME, keep=KEEP_VERSIONS):
+    """Supprime les plus anciennes versions au-delà de `keep` (jamais la courante)."""
+    meta = current(root)
+    # Tri chronologique : deux versions de la même seconde ne diffèrent que
+    # par l'empreinte, l'ordre des noms ne suffit pas
+    versions = sorted(
+        (f[len(name) + 1:-len(".joblib")]
+         for f in os.listdir(root)
+         if f.startswith(f"{name}-") and f.endswith(".joblib")),
+        key=lambda version: created_at(root, name, version),
+    )
+    for version in versions[:-keep] if keep else []:
+        if meta and version == meta["version"]:
+            continue
+        for ext in (".joblib", ".json", ".timings.json"):
+            try:
+                os.remove(os.path.join(root, f"{name}-{version}{ext}"))
+            except FileNotFoundError:
+                pass
+        shutil.rmtree(os.path.join(root, f"{name}-{version}.forest"), ignore_errors=True)
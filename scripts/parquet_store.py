@@ -0,0 +1,131 @@
+# parquet_store.py
+# Format intermédiaire Parquet des données nettoyées :
+#   cleaned_data/parquet/dataset=<table>/year=<année>/*.parquet
+
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+parquet_dir = os.path.join(os.getcwd(), "cleaned_data", "parquet")
+
+parquet_columns = ["country_region", "date", "total_cases", "total_deaths", "total_recovered"]
+partitioning = ds.partitioning(pa.schema([("year", pa.int16())]), flavor="hive")
+
+
+def dataset_path(dataset, root=parquet_dir):
+    return os.path.join(root, f"dataset={dataset}")
+
+
+def exists(dataset, root=parquet_dir):
+    return os.path.isdir(dataset_path(dataset, root))
+
+
+def _to_table(df):
+    df = df[parquet_columns].copy()
+    df["date"] = pd.to_datetime(df["date"])
+    df["year"] = df["date"].dt.year.astype("int16")
+    # Tri par pays puis date : les statistiques min/max des row groups
+    # permettent d'ignorer les pays non demandés à la lecture.
+    df = df.sort_values(["country_region", "date"], kind="stable")
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _write_years(df, dataset, root):
+    """Écrit df dans un répertoire temporaire puis remplace chaque année concernée."""
+    path = dataset_path(dataset, root)
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    if df.empty:
+        return  # pyarrow n'écrit aucun répertoire : le jeu reste vide
+    ds.write_dataset(_to_table(df), tmp_path, format="parquet", partitioning=partitioning,
+                     existing_data_behavior="overwrite_or_ignore")
+    for year_dir in os.listdir(tmp_path):
+        target = os.path.join(path, year_dir)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(os.path.join(tmp_path, year_dir), target)
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def write_dataset(df, dataset, root=parquet_dir):
+    """Réécrit complètement le jeu `dataset`, partitionné par année."""
+    shutil.rmtree(dataset_path(dataset, root), ignore_errors=True)
+    _write_years(df, dataset, root)
+    print(f"Enregistré : {dataset_path(dataset, root)} ({len(df)} lignes)")
+
+
+def upsert_dataset(df, dataset, root=parquet_dir):
+    """
+    Fusionne un delta : pour chaque (pays, mois) présent dans df, la ligne du
+    delta remplace l'existante. Seules les années touchées sont réécrites.
+    """
+    if df.empty:
+        return
+    years = sorted(pd.to_datetime(df["date"]).dt.year.unique().tolist())
+    parts = [df[parquet_columns]]
+    if exists(dataset, root):
+        parts.insert(0, read_dataset(dataset, years=years, root=root))
+    merged = pd.concat(parts, ignore_index=True)
+    merged["date"] = pd.to_datetime(merged["date"])
+    merged["year_month"] = merged["date"].dt.to_period("M")
+    merged = (merged.sort_values("date", kind="stable")
+                    .drop_duplicates(["country_region", "year_month"], keep="last"))
+    _write_years(merged, dataset, root)
+    print(f"Fusionné : {dataset_path(dataset, root)} ({len(df)} lignes, années {years})")
+
+
+def _filter(countries=None, date_from=None, date_to=None, years=None):
+    """Prédicat poussé à pyarrow : élagage des partitions et des row groups."""
+    expr = None
+
+    def add(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    if years:
+        add(ds.field("year").isin([int(y) for y in years]))
+    if countries:
+        add(ds.field("country_region").isin(list(countries)))
+    if date_from is not None:
+        date_from = pd.Timestamp(date_from)
+        add(ds.field("year") >= date_from.year)
+        add(ds.field("date") >= date_from)
+    if date_to is not None:
+        date_to = pd.Timestamp(date_to)
+        add(ds.field("year") <= date_to.year)
+        add(ds.field("date") <= date_to)
+    return expr
+
+
+def _open(dataset, root):
+    return ds.dataset(dataset_path(dataset, root), format="parquet", partitioning=partitioning)
+
+
+def read_dataset(dataset, columns=None, countries=None, date_from=None, date_to=None, years=None,
+                 root=parquet_dir):
+    """Lit uniquement les colonnes et les lignes demandées."""
+    dataset = _open(dataset, root)
+    if not dataset.files:
+        return pd.DataFrame(columns=columns or parquet_columns)
+    table = dataset.to_table(
+        columns=columns or parquet_columns,
+        filter=_filter(countries, date_from, date_to, years),
+    )
+    return table.to_pandas()
+
+
+def iter_chunks(dataset, columns=None, batch_size=50_000, root=parquet_dir, **filters):
+    """Même lecture que read_dataset, par lots de `batch_size` lignes."""
+    dataset = _open(dataset, root)
+    if not dataset.files:
+        return
+    batches = dataset.to_batches(
+        columns=columns or parquet_columns,
+        filter=_filter(**filters),
+        batch_size=batch_size,
+    )
+    for batch in batches:
+        if batch.num_rows:
+            yield batch.to_pandas()
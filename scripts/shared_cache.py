@@ -0,0 +1,197 @@
+# shared_cache.py
+# Cache partagé entre processus et réplicas du dashboard, derrière le cache
+# mémoire de dashboard_data.py : un réplica qui a déjà lu (ou calculé) un
+# résultat le rend disponible aux autres.
+#   disk  : un fichier Arrow (Feather v2, non compressé) par entrée dans
+#           DASHBOARD_CACHE_DIR, écrit dans un fichier temporaire puis renommé
+#           (os.replace) et relu en mmap ; le répertoire peut être un volume
+#           partagé entre pods.
+#   redis : même format (flux Arrow IPC) dans Redis, avec expiration native ;
+#           nécessite le paquet `redis` (REDIS_URL, défaut redis://localhost:6379/0).
+#   none  : désactivé.
+# Les clés incluent la version des données écrite par store_data.py : un
+# nouveau chargement rend les anciennes entrées inaccessibles, elles expirent
+# ensuite (TTL) ou sont évincées (taille max du répertoire).
+
+import hashlib
+import os
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+BACKEND = os.getenv("DASHBOARD_SHARED_CACHE", "disk")
+CACHE_DIR = os.getenv("DASHBOARD_CACHE_DIR", os.path.join(os.getcwd(), "cache", "dashboard"))
+MAX_MB = float(os.getenv("DASHBOARD_SHARED_CACHE_MB", "1024"))
+TTL = float(os.getenv("DASHBOARD_SHARED_CACHE_TTL", "86400"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+KEY_PREFIX = "mspr:dashboard:"
+
+
+def digest(key) -> str:
+    """Nom stable d'une clé (tuple de valeurs simples), identique d'un processus à l'autre."""
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+def to_ipc(df) -> bytes:
+    sink = pa.BufferOutputStream()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def from_ipc(data: bytes):
+    return pa.ipc.open_stream(data).read_all().to_pandas()
+
+
+class SharedCache:
+    """Interface commune : get / set / metrics ; les erreurs ne font qu'un miss."""
+
+    name = "none"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, key):
+        self._count("misses")
+        return None
+
+    def set(self, key, df):
+        pass
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        stats["backend"] = self.name
+        return stats
+
+
+class DiskCache(SharedCache):
+    """Fichiers Arrow dans `root`, bornés à `max_bytes` (les plus anciens partent d'abord)."""
+
+    name = "disk"
+
+    def __init__(self, root=CACHE_DIR, max_bytes=int(MAX_MB * 2**20), ttl=TTL):
+        super().__init__()
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, f"{digest(key)}.arrow")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            if self.ttl > 0 and time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            df = feather.read_table(path, memory_map=True).to_pandas()
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        except Exception:
+            self._count("errors")
+            self._count("misses")
+            return None
+        self._count("hits")
+        return df
+
+    def set(self, key, df):
+        path = self.path(key)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            feather.write_feather(df.reset_index(drop=True), tmp_path, compression="uncompressed")
+            os.replace(tmp_path, path)
+            self._count("writes")
+            self.prune()
+        except Exception:
+            self._count("errors")
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        """Supprime les entrées les plus anciennes au-delà de `max_bytes`."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".arrow"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # supprimée par un autre processus
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def metrics(self) -> dict:
+        stats = super().metrics()
+        sizes = [e.stat().st_size for e in os.scandir(self.root) if e.name.endswith(".arrow")]
+        stats["entries"] = len(sizes)
+        stats["size_mb"] = round(sum(sizes) / 2**20, 2)
+        return stats
+
+
+class RedisCache(SharedCache):
+    """Flux Arrow IPC dans Redis, expirés après `ttl` secondes."""
+
+    name = "redis"
+
+    def __init__(self, url=REDIS_URL, ttl=TTL):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("DASHBOARD_SHARED_CACHE=redis nécessite le paquet redis (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        try:
+            data = self.client.get(KEY_PREFIX + digest(key))
+            if data is None:
+                self._count("misses")
+                return None
+            df = from_ipc(data)
+        except Exception:
+            # Redis injoignable, valeur tronquée ou étrangère
+            self._count("errors")
+            self._count("misses")
+            return None
+        self._count("hits")
+        return df
+
+    def set(self, key, df):
+        try:
+            self.client.set(KEY_PREFIX + digest(key), to_ipc(df), ex=int(self.ttl) or None)
+            self._count("writes")
+        except Exception:
+            self._count("errors")
+
+
+def from_env(backend=BACKEND):
+    """Backend choisi par DASHBOARD_SHARED_CACHE (disk, redis ou none)."""
+    if backend == "disk":
+        return DiskCache()
+    if backend == "redis":
+        return RedisCache()
+    return SharedCache()
@@ -1,23 +1,29 @@
+import argparse
+import io
+import json
 import os
+import time
+import psycopg2
 from sqlalchemy import create_engine
 import pandas as pd
 from dotenv import load_dotenv
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise RuntimeError("La variable DATABASE_URL est manquante")
-
-engine = create_engine(DATABASE_URL)
 cleaned_dir = os.path.join(os.getcwd(), "cleaned_data")
 
-# Covid
-covid_path = os.path.join(cleaned_dir, "cleaned_covid19_daily_dataset.csv")
-df_covid = pd.read_csv(covid_path)
-print(f"Injection COVID depuis {covid_path}…")
+# Fichiers nettoyés -> table cible
+DATASETS = {
+    "covid19_daily": os.path.join(cleaned_dir, "cleaned_covid19_daily_dataset.csv"),
+    "mpox":          os.path.join(cleaned_dir, "cleaned_mpox_dataset.csv"),
+}
+
+# Dernière date stockée par pays, lue par clean_datasets.py --incremental
+watermark_file = os.path.join(cleaned_dir, "watermarks.json")
+
+def delta_path(path):
+    return path.replace(".csv", "_delta.csv")
 
 # Renommer les colonnes pour correspondre à la BDD
-rename_covid = {
+rename_columns = {
     "Country/Region": "country_region",
     "country": "country_region",
     "date": "date",
@@ -27,52 +33,314 @@ rename_covid = {
     "total_gueris": "total_recovered",
     "id": "id"
 }
-df_covid = df_covid.rename(columns=rename_covid)
-# Garder uniquement les colonnes attendues
-covid_cols = ["country_region", "date", "total_cases", "total_deaths", "total_recovered"]
-df_covid = df_covid[covid_cols]
-
-try:
-    df_covid.to_sql(
-        "covid19_daily",
-        engine,
-        if_exists="append",
-        index=False,
+# Colonnes attendues dans la BDD
+db_columns = ["country_region", "date", "total_cases", "total_deaths", "total_recovered"]
+
+CHUNK_SIZE = 50_000
+
+# Schéma de backup_local.sql : une base neuve est créée au premier chargement
+# (comme le faisait to_sql en mode append)
+TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id              serial PRIMARY KEY,
+        country_region  varchar(100),
+        date            date,
+        total_cases     integer,
+        total_deaths    integer,
+        total_recovered integer
     )
-    print(f" {len(df_covid)} lignes insérées dans covid19_daily")
-except Exception as e:
-    print(f" Erreur insertion covid19_daily : {e}")
+"""
 
-# Mpox
-mpox_path = os.path.join(cleaned_dir, "cleaned_mpox_dataset.csv")
-df_mpox = pd.read_csv(mpox_path)
-print(f"\nInjection MPOX depuis {mpox_path}…")
+# Fusion staging -> table : une ligne par (pays, date), mise à jour si elle
+# existe déjà (et a changé), insertion sinon. Recharger le même fichier ne
+# crée donc aucun doublon.
+MERGE_SQL = """
+    WITH data AS (
+        SELECT DISTINCT ON (country_region, date)
+               country_region, date, total_cases, total_deaths, total_recovered
+        FROM {staging}
+        WHERE country_region IS NOT NULL AND date IS NOT NULL
+        ORDER BY country_region, date, ord DESC
+    ),
+    updated AS (
+        UPDATE {table} t
+        SET total_cases     = d.total_cases,
+            total_deaths    = d.total_deaths,
+            total_recovered = d.total_recovered
+        FROM data d
+        WHERE t.country_region = d.country_region
+          AND t.date = d.date
+          AND (t.total_cases, t.total_deaths, t.total_recovered)
+              IS DISTINCT FROM (d.total_cases, d.total_deaths, d.total_recovered)
+        RETURNING 1
+    ),
+    inserted AS (
+        INSERT INTO {table} (country_region, date, total_cases, total_deaths, total_recovered)
+        SELECT d.country_region, d.date, d.total_cases, d.total_deaths, d.total_recovered
+        FROM data d
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {table} t
+            WHERE t.country_region = d.country_region AND t.date = d.date
+        )
+        ORDER BY d.date, d.country_region  -- ordre physique par date : BRIN efficace
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM inserted), (SELECT count(*) FROM updated)
+"""
 
-# Renommer les colonnes pour correspondre à la BDD
-rename_mpox = {
-    "Country/Region": "country_region",
-    "country": "country_region",
-    "date": "date",
-    "total_cases": "total_cases",
-    "total_deaths": "total_deaths",
-    "total_recovered": "total_recovered",
-    "total_gueris": "total_recovered",
-    "id": "id"
-}
-df_mpox = df_mpox.rename(columns=rename_mpox)
-# Garder uniquement les colonnes attendues
-mpox_cols = ["country_region", "date", "total_cases", "total_deaths", "total_recovered"]
-df_mpox = df_mpox[mpox_cols]
-
-try:
-    df_mpox.to_sql(
-        "mpox",
-        engine,
-        if_exists="append",
-        index=False,
+# Même fusion une fois la contrainte unique (pays, date) posée par
+# migrations.py : deux chargements concurrents ne se gênent plus (pas de
+# violation d'unicité entre la recherche et l'insertion).
+UPSERT_SQL = """
+    WITH data AS (
+        SELECT DISTINCT ON (country_region, date)
+               country_region, date, total_cases, total_deaths, total_recovered,
+               EXISTS (
+                   SELECT 1 FROM {table} t
+                   WHERE t.country_region = s.country_region AND t.date = s.date
+               ) AS existed
+        FROM {staging} s
+        WHERE country_region IS NOT NULL AND date IS NOT NULL
+        ORDER BY country_region, date, ord DESC
+    ),
+    merged AS (
+        INSERT INTO {table} AS t (country_region, date, total_cases, total_deaths, total_recovered)
+        SELECT country_region, date, total_cases, total_deaths, total_recovered
+        FROM data
+        ORDER BY date, country_region
+        ON CONFLICT (country_region, date) DO UPDATE
+        SET total_cases     = EXCLUDED.total_cases,
+            total_deaths    = EXCLUDED.total_deaths,
+            total_recovered = EXCLUDED.total_recovered
+        WHERE (t.total_cases, t.total_deaths, t.total_recovered)
+              IS DISTINCT FROM (EXCLUDED.total_cases, EXCLUDED.total_deaths, EXCLUDED.total_recovered)
+        RETURNING t.country_region, t.date
+    )
+    -- xmax n'est pas lisible sur une table partitionnée : insertion ou mise
+    -- à jour se déduit de l'existence de la ligne avant la fusion
+    SELECT count(*) FILTER (WHERE NOT d.existed), count(*) FILTER (WHERE d.existed)
+    FROM merged m JOIN data d USING (country_region, date)
+"""
+
+UNIQUE_KEY_SQL = """
+    SELECT 1 FROM pg_constraint
+    WHERE conrelid = to_regclass(%s) AND conname = %s AND contype = 'u'
+"""
+
+# Mode incrémental : le mois en cours a été retraité, son ancien "dernier
+# jour" est remplacé par le nouveau et doit disparaître.
+PRUNE_SQL = """
+    DELETE FROM {table} t
+    USING (
+        SELECT country_region, max(date) AS date
+        FROM {staging}
+        GROUP BY country_region, date_trunc('month', date)
+    ) d
+    WHERE t.country_region = d.country_region
+      AND date_trunc('month', t.date) = date_trunc('month', d.date)
+      AND t.date < d.date
+"""
+
+# Version des données par table, incrémentée à chaque chargement : le
+# dashboard (dashboard_data.py) l'inclut dans ses clés de cache.
+VERSIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS data_versions (
+        table_name varchar(100) PRIMARY KEY,
+        version    bigint       NOT NULL,
+        updated_at timestamptz  NOT NULL DEFAULT now()
     )
-    print(f"{len(df_mpox)} lignes insérées dans mpox")
-except Exception as e:
-    print(f"Erreur insertion mpox : {e}")
+"""
+
+BUMP_VERSION_SQL = """
+    INSERT INTO data_versions (table_name, version) VALUES (%s, 1)
+    ON CONFLICT (table_name)
+    DO UPDATE SET version = data_versions.version + 1, updated_at = now()
+"""
+
+
+def bump_version(cur, table):
+    cur.execute(VERSIONS_SQL)
+    cur.execute(BUMP_VERSION_SQL, (table,))
+
+
+def has_unique_key(cur, table):
+    """Vrai si la contrainte unique (pays, date) de migrations.py existe."""
+    cur.execute(UNIQUE_KEY_SQL, (table, f"{table}_country_date_key"))
+    return cur.fetchone() is not None
+
+
+def get_database_url():
+    load_dotenv()
+    DATABASE_URL = os.getenv("DATABASE_URL")
+    if not DATABASE_URL:
+        raise RuntimeError("La variable DATABASE_URL est manquante")
+    return DATABASE_URL
+
+
+def read_cleaned_chunks(path, chunksize=CHUNK_SIZE):
+    """Lit un CSV nettoyé par morceaux, colonnes renommées au format BDD."""
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        chunk = chunk.rename(columns=rename_columns)
+        yield chunk[db_columns]
+
+
+def read_parquet_chunks(dataset, chunksize=CHUNK_SIZE):
+    """Lit le jeu Parquet partitionné de clean_datasets.py --format parquet."""
+    import parquet_store
+    yield from parquet_store.iter_chunks(dataset, columns=db_columns, batch_size=chunksize)
+
+
+def load_append(database_url, table, chunks):
+    """Ancien mode : INSERT via DataFrame.to_sql, sans dédoublonnage."""
+    engine = create_engine(database_url)
+    total = 0
+    for chunk in chunks:
+        chunk.to_sql(table, engine, if_exists="append", index=False)
+        total += len(chunk)
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cur:
+            bump_version(cur, table)
+    finally:
+        conn.close()
+    print(f" {total} lignes insérées dans {table}")
+    return total
+
+
+def load_copy(database_url, table, chunks, prune=False):
+    """
+    Charge les morceaux (CSV ou Parquet) via COPY FROM STDIN dans une table temporaire,
+    puis fusionne dans la table cible (upsert sur pays + date), le tout dans
+    une seule transaction.
+    Avec `prune`, les lignes d'un même mois antérieures à la nouvelle
+    dernière date sont supprimées (chargement d'un delta incrémental).
+    """
+    start = time.perf_counter()
+    staging = f"staging_{table}"
+    conn = psycopg2.connect(database_url)
+    try:
+        cur = conn.cursor()
+        cur.execute(TABLE_SQL.format(table=table))
+        cur.execute(f"""
+            CREATE TEMP TABLE {staging} (
+                ord             bigserial,
+                country_region  varchar(100),
+                date            date,
+                total_cases     double precision,
+                total_deaths    double precision,
+                total_recovered double precision
+            ) ON COMMIT DROP
+        """)
+        total = 0
+        for chunk in chunks:
+            buffer = io.StringIO()
+            chunk.to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+            cur.copy_expert(
+                f"COPY {staging} ({', '.join(db_columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+            total += len(chunk)
+        import migrations
+        # Table partitionnée : partitions des années reçues, avant la fusion
+        cur.execute(f"SELECT DISTINCT extract(year FROM date)::int FROM {staging} WHERE date IS NOT NULL")
+        migrations.ensure_partitions(cur, [row[0] for row in cur.fetchall()], table)
+        merge_sql = UPSERT_SQL if has_unique_key(cur, table) else MERGE_SQL
+        cur.execute(merge_sql.format(staging=staging, table=table))
+        inserted, updated = cur.fetchone()
+        if prune:
+            cur.execute(PRUNE_SQL.format(staging=staging, table=table))
+        if inserted or updated or prune:
+            bump_version(cur, table)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    print(f" {table} : {total} lignes lues, {inserted} insérées, {updated} mises à jour "
+          f"en {elapsed:.2f}s ({total / elapsed:,.0f} lignes/s)")
+    return total
+
+
+def update_watermarks(database_url, tables, path=watermark_file):
+    """Enregistre la dernière date stockée par pays pour chaque table."""
+    watermarks = {}
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            for table in tables:
+                cur.execute(f"""
+                    SELECT country_region, max(date)
+                    FROM {table}
+                    WHERE country_region IS NOT NULL AND date IS NOT NULL
+                    GROUP BY country_region
+                """)
+                watermarks[table] = {country: day.isoformat() for country, day in cur.fetchall()}
+    finally:
+        conn.close()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(watermarks, f, indent=1, sort_keys=True, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    print(f"Watermarks enregistrés : {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stockage des CSV nettoyés dans PostgreSQL")
+    parser.add_argument("--mode", choices=["copy", "append"], default="copy",
+                        help="copy : COPY + upsert idempotent (défaut) ; append : ancien to_sql")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--incremental", action="store_true",
+                        help="charger les deltas de clean_datasets.py --incremental")
+    parser.add_argument("--source", choices=["csv", "parquet"], default="csv",
+                        help="lire les CSV nettoyés ou le jeu Parquet partitionné")
+    parser.add_argument("--forecasts", action="store_true",
+                        help="recalculer ensuite les prévisions Prophet du dashboard (forecasts.py)")
+    parser.add_argument("--forecast-workers", type=int, default=None,
+                        help="nombre de processus pour les prévisions (défaut : un par CPU)")
+    args = parser.parse_args()
+    if args.incremental and args.mode == "append":
+        # Un delta rejoué ou chevauchant le précédent serait inséré en double
+        parser.error("--incremental nécessite --mode copy (upsert sur pays + date)")
+
+    database_url = get_database_url()
+    loaded = []
+    for table, path in DATASETS.items():
+        if args.source == "parquet":
+            dataset = f"{table}_delta" if args.incremental else table
+            print(f"\nInjection {table} depuis le jeu Parquet {dataset}…")
+            chunks = read_parquet_chunks(dataset, args.chunksize)
+        else:
+            if args.incremental:
+                path = delta_path(path)
+            print(f"\nInjection {table} depuis {path}…")
+            chunks = read_cleaned_chunks(path, args.chunksize)
+        try:
+            if args.mode == "copy":
+                load_copy(database_url, table, chunks, prune=args.incremental)
+            else:
+                load_append(database_url, table, chunks)
+            loaded.append(table)
+        except Exception as e:
+            print(f" Erreur insertion {table} : {e}")
+
+    if loaded and args.mode == "copy":
+        update_watermarks(database_url, loaded)
+
+    if loaded:
+        import aggregates
+        print("\nRafraîchissement des vues pré-agrégées…")
+        aggregates.refresh(database_url, loaded)
+
+    if loaded and args.forecasts:
+        import forecasts
+        print("\nCalcul des prévisions…")
+        forecasts.run_forecasts(database_url, loaded, args.forecast_workers)
+
+    print("\nStockage terminé.")
+
 
-print("\nStockage terminé.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import sys
+import os
+
+import pandas as pd
+import psycopg2
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+import migrations
+import store_data
+import api.api
+from api.db import ConnectionPool
+
+
+@pytest.fixture
+def scoped_db():
+    """Schéma temporaire avec trois jours de France déjà chargés."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL non définie")
+    try:
+        admin = psycopg2.connect(url)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL injoignable : {e}")
+    admin.autocommit = True
+    schema = f"test_api_bulk_{os.getpid()}"
+    with admin.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+    scoped = url + ("&" if "?" in url else "?") + f"options=-csearch_path%3D{schema}"
+    rows = pd.DataFrame([
+        ("France", pd.Timestamp(f"2021-01-0{day}").date(), day * 10, day, day * 5)
+        for day in (1, 2, 3)
+    ], columns=store_data.db_columns)
+    try:
+        for table in migrations.TABLES:
+            store_data.load_copy(scoped, table, iter([rows]))
+        yield scoped
+    finally:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+
+def table_rows(url):
+    conn = psycopg2.connect(url)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT country_region, date::text, total_cases FROM covid19_daily "
+                        "ORDER BY country_region, date")
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("unique_key", [False, True], ids=["staging", "on_conflict"])
+def test_bulk_upsert_counts(scoped_db, monkeypatch, unique_key):
+    if unique_key:
+        migrations.migrate(scoped_db)  # ajoute la contrainte unique (pays, date)
+    pool = ConnectionPool(scoped_db, maxconn=2)
+    monkeypatch.setattr(api.api, "pool", pool)
+    paths = []
+    build = api.api.build_merge_query
+    monkeypatch.setattr(api.api, "build_merge_query",
+                        lambda *args, **kw: paths.append(args[-1]) or build(*args, **kw))
+    client = TestClient(api.api.app)
+
+    def post(items, upsert="true"):
+        response = client.post(f"/api/covid19_daily/bulk?upsert={upsert}", json=items)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def item(country, day, cases):
+        return {"country_region": country, "date": f"2021-01-0{day}",
+                "total_cases": cases, "total_deaths": day, "total_recovered": day * 5}
+
+    batch = [
+        item("France", 2, 25),    # modifiée
+        item("France", 3, 30),    # identique : ni insérée ni mise à jour
+        item("Italy", 1, 1),      # doublon du lot : la dernière ligne l'emporte
+        item("Italy", 1, 7),
+        item("Spain", 4, 40),
+    ]
+    try:
+        assert post(batch) == {"received": 5, "inserted": 2, "updated": 1}
+        assert post(batch) == {"received": 5, "inserted": 0, "updated": 0}
+        assert table_rows(scoped_db) == [
+            ("France", "2021-01-01", 10), ("France", "2021-01-02", 25), ("France", "2021-01-03", 30),
+            ("Italy", "2021-01-01", 7), ("Spain", "2021-01-04", 40),
+        ]
+        assert paths == [unique_key, unique_key]
+        assert post([item("Spain", 5, 50)], upsert="false") == {"received": 1, "inserted": 1, "updated": 0}
+        assert pool.metrics()["in_use"] == 0
+    finally:
+        pool.close()
@@ -0,0 +1,129 @@
+import asyncio
+import gzip
+import json
+import sys
+import os
+from contextlib import contextmanager
+from datetime import date
+
+import psycopg2
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import api.api
+from api.api import COVID_COLUMNS, export_response
+
+ROWS = [
+    {"id": i, "country_region": "France", "date": date(2021, 1, i),
+     "total_cases": 10.0 * i, "total_deaths": float(i), "total_recovered": 5.0 * i}
+    for i in range(1, 6)
+]
+
+class FakeCursor:
+    def __init__(self, rows, fail_after=None):
+        self.rows = list(rows)
+        self.fail_after = fail_after
+        self.fetches = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def execute(self, query, params):
+        self.query = query
+
+    def fetchmany(self, size):
+        if self.fail_after is not None and self.fetches >= self.fail_after:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+        self.fetches += 1
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+class FakeConnection:
+    closed = 0
+    autocommit = True
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.cursor_names = []
+
+    def cursor(self, name=None, cursor_factory=None):
+        self.cursor_names.append(name)
+        return self._cursor
+
+    def rollback(self):
+        pass
+
+class FakePool:
+    """Pool minimal : compte les connexions prêtées et rendues."""
+
+    def __init__(self, cursor):
+        self.conn = FakeConnection(cursor)
+        self.in_use = 0
+
+    @contextmanager
+    def connection(self):
+        self.in_use += 1
+        try:
+            yield self.conn
+        finally:
+            self.in_use -= 1
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    def install(fail_after=None):
+        pool = FakePool(FakeCursor(ROWS, fail_after))
+        monkeypatch.setattr(api.api, "pool", pool)
+        monkeypatch.setattr(api.api.iter_row_chunks, "__defaults__", (None, 2))
+        return pool
+    return install
+
+def test_export_ndjson(fake_pool):
+    pool = fake_pool()
+    response = TestClient(api.api.app).get("/api/covid19_daily/export", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in lines] == [1, 2, 3, 4, 5]
+    assert lines[0]["date"] == "2021-01-01"
+    assert pool.conn.cursor_names == ["export"]
+    assert pool.in_use == 0 and pool.conn._cursor.closed
+
+def test_export_csv_gzip(fake_pool):
+    fake_pool()
+    response = TestClient(api.api.app).get(
+        "/api/covid19_daily/export", params={"format": "csv", "gzip": "true"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="covid19_daily.csv.gz"' in response.headers["content-disposition"]
+    lines = gzip.decompress(response.content).decode().splitlines()
+    assert lines[0] == "id,country_region,date,total_cases,total_deaths,total_recovered"
+    assert lines[1] == "1,France,2021-01-01,10.0,1.0,5.0"
+    assert len(lines) == 6
+
+def test_export_client_disconnect_releases_cursor_and_connection(fake_pool):
+    pool = fake_pool()
+    response = export_response("covid19_daily", COVID_COLUMNS, "ndjson", False)
+
+    async def read_first_block_then_disconnect():
+        first = await response.body_iterator.__anext__()
+        assert pool.in_use == 1
+        await response.body_iterator.aclose()
+        return first
+
+    first = asyncio.run(read_first_block_then_disconnect())
+    assert json.loads(first.splitlines()[0])["id"] == 1
+    assert pool.conn._cursor.closed
+    assert pool.in_use == 0
+
+def test_export_db_error_after_first_rows_aborts_stream(fake_pool, capsys):
+    pool = fake_pool(fail_after=2)
+    with pytest.raises(psycopg2.OperationalError):
+        TestClient(api.api.app).get("/api/covid19_daily/export")
+    assert "Export interrompu après 4 lignes" in capsys.readouterr().out
+    assert pool.in_use == 0
@@ -0,0 +1,98 @@
+import sys
+import os
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from api.api import build_page_query, to_page, COVID_COLUMNS, MPOX_COLUMNS
+
+def test_page_query_filters_and_cursor():
+    query, params = build_page_query(
+        "mpox", MPOX_COLUMNS, fields="date,total_cases", countries=["France", "Italy"],
+        date_from="2022-01-01", cursor=42, limit=10
+    )
+    assert 'country_region = ANY(%s)' in query
+    assert 'date >= %s' in query
+    assert "id > %s" in query
+    assert "ORDER BY id" in query
+    assert params == [["France", "Italy"], "2022-01-01", 42, 11]
+
+def test_page_query_projection_keeps_id():
+    query, _ = build_page_query("covid19_daily", COVID_COLUMNS, fields="total_deaths")
+    assert "id," in query
+    assert "total_deaths" in query
+    assert "total_cases" not in query
+
+def test_page_query_rejects_unknown_field():
+    with pytest.raises(Exception):
+        build_page_query("covid19_daily", COVID_COLUMNS, fields="password")
+
+def test_to_page_next_cursor():
+    rows, next_cursor = to_page([{"id": 1}, {"id": 2}, {"id": 3}], limit=2)
+    assert [r["id"] for r in rows] == [1, 2]
+    assert next_cursor == 2
+    assert to_page([{"id": 1}], limit=2) == ([{"id": 1}], None)
+
+def test_list_keeps_typed_list_and_returns_cursor_in_headers(monkeypatch):
+    from datetime import date
+    from fastapi.testclient import TestClient
+    import api.api
+
+    rows = [
+        {"id": i, "country_region": "France", "date": date(2021, 1, i),
+         "total_cases": 10 * i, "total_deaths": i, "total_recovered": 5 * i}
+        for i in (1, 2, 3)
+    ]
+
+    async def fake_fetchall(query, params=None):
+        return rows[:params[-1]]
+    monkeypatch.setattr(api.api, "afetchall_dicts", fake_fetchall)
+    client = TestClient(api.api.app)
+
+    response = client.get("/api/covid19_daily", params={"limit": 2, "country": "France"})
+    assert response.status_code == 200
+    assert response.json() == [
+        {"id": 1, "country_region": "France", "date": "2021-01-01",
+         "total_cases": 10.0, "total_deaths": 1.0, "total_recovered": 5.0},
+        {"id": 2, "country_region": "France", "date": "2021-01-02",
+         "total_cases": 20.0, "total_deaths": 2.0, "total_recovered": 10.0},
+    ]
+    assert response.headers["X-Next-Cursor"] == "2"
+    assert "cursor=2" in response.headers["Link"] and "country=France" in response.headers["Link"]
+
+    # Dernière page : pas de curseur ; projection validée avec les types du modèle
+    response = client.get("/api/mpox", params={"limit": 5, "fields": "date,total_cases"})
+    assert "X-Next-Cursor" not in response.headers
+    assert response.json()[0] == {"id": 1, "date": "2021-01-01", "total_cases": 10.0}
+
+def test_aggregate_query_filters():
+    from api.api import build_aggregate_query
+
+    query, params = build_aggregate_query("mpox_monthly", countries=["France"], date_from="2023-01-15")
+    assert "country_region = ANY(%s)" in query
+    assert "month >= date_trunc('month', %s::date)" in query
+    assert query.endswith("ORDER BY country_region, month")
+    assert params == [["France"], "2023-01-15"]
+
+    # Pas de filtre pays sur la vue globale, pas de filtre de date sur la dernière ligne
+    query, params = build_aggregate_query("mpox_global_monthly", countries=["France"])
+    assert "WHERE" not in query and params == []
+    query, params = build_aggregate_query("covid19_daily_latest", date_from="2023-01-01")
+    assert "WHERE" not in query and params == []
+
+def schema_columns(table):
+    """Colonnes de `table` dans le schéma de référence (backup_local.sql)."""
+    path = os.path.join(os.path.dirname(__file__), '..', 'backup_local.sql')
+    with open(path) as f:
+        sql = f.read()
+    body = sql.split(f"CREATE TABLE public.{table} (")[1].split(");")[0]
+    return {line.split()[0] for line in body.strip().splitlines()}
+
+def test_column_maps_match_schema():
+    from api.api import build_merge_query
+
+    for table, columns in (("covid19_daily", COVID_COLUMNS), ("mpox", MPOX_COLUMNS)):
+        assert set(columns.values()) == schema_columns(table)
+        fields = [f for f in columns if f != "id"]
+        query = build_merge_query(table, columns, fields, upsert=True)
+        assert f"INSERT INTO {table} (country_region, date, total_cases, total_deaths, total_recovered)" in query
@@ -0,0 +1,27 @@
+import sys
+import os
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from api.batcher import MicroBatcher
+
+def test_concurrent_calls_share_a_batch():
+    calls = []
+
+    def double(rows):
+        calls.append(len(rows))
+        return [r * 2 for r in rows]
+
+    async def run():
+        batcher = MicroBatcher(double, max_batch=8, max_wait_ms=50)
+        await batcher.start()
+        try:
+            results = await asyncio.gather(*(batcher.submit(i) for i in range(20)))
+        finally:
+            await batcher.stop()
+        return results, batcher.metrics()
+
+    results, metrics = asyncio.run(run())
+    assert results == [i * 2 for i in range(20)]
+    assert calls == [8, 8, 4]
+    assert metrics["batches"] == 3 and metrics["max_batch_seen"] == 8
@@ -0,0 +1,23 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from api.cache import LRUCache
+
+def test_lru_eviction_and_ttl():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1          # "a" devient le plus récent
+    cache.set("c", 3)                   # "b" est évincé
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    metrics = cache.metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["evictions"]) == (2, 1, 1)
+
+    cache = LRUCache(maxsize=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.metrics()["expired"] == 1
@@ -0,0 +1,94 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+import pandas as pd
+import psycopg2
+import pytest
+from sqlalchemy import create_engine
+
+import aggregates
+import store_data
+from dashboard_data import DashboardData, QueryCache
+
+
+def frame(n):
+    return pd.DataFrame({"total_cases": range(n)}, dtype="int64")
+
+
+def test_query_cache_bounded_in_bytes():
+    size = int(frame(100).memory_usage(index=True, deep=True).sum())
+    cache = QueryCache(max_bytes=size * 2)
+    cache.set("a", frame(100))
+    cache.set("b", frame(100))
+    assert cache.get("a") is not None  # "a" devient la plus récente
+    cache.set("c", frame(100))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    # Trop gros pour le cache : jamais stocké
+    cache.set("big", frame(10_000))
+    assert cache.get("big") is None
+
+    stats = cache.metrics()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert stats["hits"] == 3 and stats["misses"] == 2
+    assert stats["hit_rate"] == 3 / 5
+
+
+def test_query_cache_ttl():
+    cache = QueryCache(max_bytes=10**6, ttl=0.05)
+    cache.set("a", frame(10))
+    assert cache.get("a") is not None
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.metrics()["expired"] == 1
+    assert cache.nbytes == 0
+
+
+@pytest.fixture
+def scoped_engine():
+    """Moteur SQLAlchemy restreint à un schéma temporaire chargé, vues comprises."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL non définie")
+    try:
+        admin = psycopg2.connect(url)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL injoignable : {e}")
+    admin.autocommit = True
+    schema = f"test_dashboard_data_{os.getpid()}"
+    with admin.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+    scoped = url + ("&" if "?" in url else "?") + f"options=-csearch_path%3D{schema}"
+    rows = pd.DataFrame([
+        (country, day.date(), i * 10 + n, i, i * 5)
+        for n, country in enumerate(("France", "Italy"))
+        for i, day in enumerate(pd.date_range("2021-01-01", "2021-03-31", freq="D"))
+    ], columns=store_data.db_columns)
+    engine = create_engine(scoped)
+    try:
+        store_data.load_copy(scoped, "covid19_daily", iter([rows]))
+        aggregates.refresh(scoped, ["covid19_daily"])
+        yield engine
+    finally:
+        engine.dispose()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+
+def test_latest_follows_end_of_period(scoped_engine):
+    data = DashboardData(scoped_engine, cache=QueryCache(2**20))
+    whole = data.latest("covid19_daily", ["France", "Italy"])
+    assert whole["date"].dt.strftime("%Y-%m-%d").tolist() == ["2021-03-31", "2021-03-31"]
+    assert whole["total_cases"].tolist() == [890, 891]
+
+    february = data.latest("covid19_daily", ["Italy", "France"], date_to="2021-02-28")
+    assert february["date"].dt.strftime("%Y-%m-%d").tolist() == ["2021-02-28", "2021-02-28"]
+    assert february["total_cases"].tolist() == [580, 581]
+    series = data.series("covid19_daily", ["France", "Italy"], "2021-02-01", "2021-02-28")
+    assert february["total_cases"].sum() == series.groupby("country")["total_cases"].last().sum()
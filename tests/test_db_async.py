@@ -0,0 +1,83 @@
+import importlib
+import sys
+import os
+
+import pandas as pd
+import psycopg2
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+import aggregates
+import store_data
+import api.api
+
+URLS = [
+    "/api/covid19_daily?limit=5&country=France&country=Italy",
+    "/api/covid19_daily?limit=5&cursor=5&fields=date,total_cases&date_from=2021-01-03",
+    "/api/mpox?limit=100&date_to=2021-01-04",
+    "/api/covid19_daily/latest?country=Spain",
+    "/api/covid19_daily/summary",
+    "/api/mpox/monthly?country=France",
+    "/api/mpox/monthly/global",
+    "/api/covid19_daily?fields=inconnu",
+]
+
+
+@pytest.fixture
+def scoped_db():
+    """Schéma temporaire rempli avec quelques jours de données, vues comprises."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL non définie")
+    try:
+        admin = psycopg2.connect(url)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL injoignable : {e}")
+    admin.autocommit = True
+    schema = f"test_db_async_{os.getpid()}"
+    with admin.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+    scoped = url + ("&" if "?" in url else "?") + f"options=-csearch_path%3D{schema}"
+    rows = pd.DataFrame([
+        (country, day.date(), i * 10 + n, i, i * 5)
+        for n, country in enumerate(("France", "Italy", "Spain"))
+        for i, day in enumerate(pd.date_range("2021-01-01", "2021-02-10", freq="D"))
+    ], columns=store_data.db_columns)
+    try:
+        for table in aggregates.TABLES:
+            store_data.load_copy(scoped, table, iter([rows]))
+        aggregates.refresh(scoped)
+        yield scoped
+    finally:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+
+def responses(monkeypatch, url, mode):
+    """Recharge l'API dans le mode demandé et rejoue URLS."""
+    monkeypatch.setenv("DATABASE_URL", url)
+    monkeypatch.setenv("DB_MODE", mode)
+    module = importlib.reload(api.api)
+    assert (module.async_pool is not None) == (mode == "async")
+    with TestClient(module.app) as client:
+        return [
+            (r.status_code, r.json(), r.headers.get("X-Next-Cursor"))
+            for r in (client.get(path) for path in URLS)
+        ]
+
+
+def test_sync_and_async_modes_return_the_same_results(scoped_db, monkeypatch):
+    try:
+        sync = responses(monkeypatch, scoped_db, "sync")
+        async_ = responses(monkeypatch, scoped_db, "async")
+    finally:
+        monkeypatch.undo()
+        importlib.reload(api.api)
+    assert [status for status, _, _ in sync] == [200] * (len(URLS) - 1) + [400]
+    assert all(body for _, body, _ in sync)
+    assert sync[0][2] is not None and len(sync[0][1]) == 5
+    assert async_ == sync
@@ -0,0 +1,77 @@
+import sys
+import os
+import time
+
+import psycopg2
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from api.db import ConnectionPool, PoolUnavailable
+
+
+def test_unreachable_database_raises_pool_unavailable():
+    pool = ConnectionPool("postgresql://postgres@127.0.0.1:1/mspr_db", minconn=1, maxconn=2)
+    with pytest.raises(PoolUnavailable):
+        with pool.connection():
+            pass
+    # Le créneau est rendu : l'appel suivant échoue de la même façon, sans attendre
+    assert pool.metrics()["in_use"] == 0
+
+
+@pytest.fixture
+def database_url():
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL non définie")
+    try:
+        psycopg2.connect(url).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL injoignable : {e}")
+    return url
+
+
+def kill_backends(url, application_name):
+    """Coupe les connexions du pool, comme un redémarrage de PostgreSQL."""
+    admin = psycopg2.connect(url)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute("SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE application_name = %s",
+                    (application_name,))
+        for _ in range(50):
+            cur.execute("SELECT count(*) FROM pg_stat_activity WHERE application_name = %s",
+                        (application_name,))
+            if cur.fetchone()[0] == 0:
+                break
+            time.sleep(0.05)
+    admin.close()
+
+
+def select_one(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+        return cur.fetchone()[0]
+
+
+def test_killed_backend_read_is_retried_write_gets_503(database_url, monkeypatch):
+    import api.api
+
+    name = f"test_db_pool_{os.getpid()}"
+    url = database_url + ("&" if "?" in database_url else "?") + f"application_name={name}"
+    pool = ConnectionPool(url, minconn=1, maxconn=2)
+    try:
+        assert pool.run(select_one) == 1
+
+        # Connexion utilisée il y a moins de idle_check : pas de SELECT 1 préalable
+        kill_backends(database_url, name)
+        monkeypatch.setattr(api.api, "pool", pool)
+        assert api.api.fetchall_dicts("SELECT 1 AS x") == [{"x": 1}]
+        assert pool.metrics()["retries"] == 1
+
+        kill_backends(database_url, name)
+        with pytest.raises(PoolUnavailable):
+            pool.run(select_one)
+        # Les connexions restantes sont vérifiées : la requête suivante passe
+        assert pool.run(select_one) == 1
+        assert pool.metrics()["in_use"] == 0
+    finally:
+        pool.close()
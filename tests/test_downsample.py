@@ -0,0 +1,42 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+import numpy as np
+import pandas as pd
+from downsample import decimate, lttb, pick_frequency
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    y[437] = 25.0
+    idx = lttb(x, y, 100)
+    assert len(idx) == 100
+    assert idx[0] == 0 and idx[-1] == 999
+    assert np.all(np.diff(idx) > 0)
+    assert 437 in idx
+    # Série déjà assez courte : inchangée
+    assert list(lttb(x[:50], y[:50], 100)) == list(range(50))
+
+
+def test_decimate_per_country():
+    dates = pd.date_range("2020-01-01", periods=3000, freq="D")
+    df = pd.concat([
+        pd.DataFrame({"country": c, "date": dates, "total_cases": np.arange(3000) * k})
+        for c, k in (("France", 1), ("Italy", 2))
+    ])
+    out = decimate(df, "date", "total_cases", max_points=300, group="country")
+    assert out.groupby("country").size().to_dict() == {"France": 300, "Italy": 300}
+    assert out.groupby("country")["total_cases"].max().to_dict() == {"France": 2999, "Italy": 5998}
+
+    monthly = decimate(df, "date", "total_cases", max_points=120, method="resample", group="country")
+    assert set(monthly["country"]) == {"France", "Italy"}
+    assert len(monthly) == 2 * 99  # mois de janvier 2020 à mars 2028
+    assert decimate(df, "date", "total_cases", method="none") is df
+
+
+def test_pick_frequency_follows_window():
+    assert pick_frequency("2021-01-01", "2021-03-01", 100) == "D"
+    assert pick_frequency("2020-01-01", "2022-01-01", 200) == "W"
+    assert pick_frequency("2000-01-01", "2022-01-01", 300) == "ME"
@@ -0,0 +1,33 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+import pandas as pd
+from forecasts import HISTORY_MONTHS, monthly_series, prepare_series
+
+
+def test_monthly_series_sums_months_and_fills_gaps():
+    df = pd.DataFrame({
+        "country": ["France", "France", "France", "Italy"],
+        "date": ["2021-01-05", "2021-01-20", "2021-03-31", "2021-02-01"],
+        "total_cases": [1, 2, 5, 7],
+        "total_deaths": [None, None, None, 1],
+    })
+    series = monthly_series(df, ["total_cases", "total_deaths"])
+
+    france = series[("France", "total_cases")]
+    assert list(france["ds"].dt.strftime("%Y-%m-%d")) == ["2021-01-31", "2021-02-28", "2021-03-31"]
+    assert list(france["y"]) == [3, 0, 5]
+    # Aucune valeur connue : pas de série
+    assert ("France", "total_deaths") not in series
+    assert list(series[("Italy", "total_deaths")]["y"]) == [1]
+
+
+def test_prepare_series_keeps_last_months():
+    dates = pd.date_range("2018-01-01", periods=50, freq="MS")
+    df = pd.DataFrame({"country": "France", "date": dates, "total_cases": range(50)})
+    series = prepare_series(df, "total_cases")
+    assert len(series) == HISTORY_MONTHS
+    assert series["y"].iloc[-1] == 49
+    assert series["ds"].iloc[-1] == pd.Timestamp("2022-02-28")
+    assert prepare_series(df.iloc[:0], "total_cases").empty
@@ -0,0 +1,31 @@
+import sys
+import os
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(root)
+sys.path.append(os.path.join(root, 'scripts'))
+from api.forest import CompactForest
+from forest_export import export_forest
+
+def test_compact_forest_matches_sklearn(tmp_path):
+    rng = np.random.default_rng(0)
+    X = np.c_[rng.integers(0, 5000, 2000), rng.integers(0, 500000, 2000)]
+    y = (X[:, 1] + 50 * X[:, 0] + rng.normal(0, 20000, 2000) > 250000).astype(int)
+    clf = RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+
+    export_forest(clf, str(tmp_path / "forest"))
+    forest = CompactForest.load(str(tmp_path / "forest"))
+
+    X_test = np.c_[rng.integers(0, 6000, 5000), rng.integers(0, 600000, 5000)]
+    # Valeurs exactement sur les seuils : vérifie l'arrondi float32 des seuils
+    internal = forest.children[0::2] != np.arange(len(forest.threshold))
+    thresholds, features = forest.threshold[internal], forest.feature[internal]
+    on_threshold = np.c_[rng.integers(0, 6000, len(thresholds)), rng.integers(0, 600000, len(thresholds))]
+    on_threshold = on_threshold.astype(np.float64)
+    on_threshold[np.arange(len(thresholds)), features] = thresholds
+    for data in (X_test, on_threshold):
+        assert np.allclose(forest.predict_proba(data), clf.predict_proba(data), rtol=0, atol=1e-12)
+        assert np.array_equal(forest.predict(data), clf.predict(data))
@@ -0,0 +1,112 @@
+import sys
+import os
+
+import pandas as pd
+import psycopg2
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+import migrations
+import store_data
+from migrations import MIGRATIONS, pending, plan_indexes, plan_relations, plan_seq_scans
+
+
+def test_pending_respects_order_and_options():
+    assert [m[0] for m in pending(set())] == [1, 2]
+    assert [m[0] for m in pending({1}, options=["partition"])] == [2, 4]
+    assert pending({m[0] for m in MIGRATIONS}, options=["brin", "partition"]) == []
+    versions = [m[0] for m in MIGRATIONS]
+    assert versions == sorted(versions) and len(set(versions)) == len(versions)
+
+
+def test_plan_walkers():
+    plan = {
+        "Node Type": "Append",
+        "Plans": [
+            {"Node Type": "Index Only Scan", "Index Name": "covid19_daily_y2021_key",
+             "Relation Name": "covid19_daily_y2021"},
+            {"Node Type": "Sort", "Plans": [
+                {"Node Type": "Seq Scan", "Relation Name": "covid19_daily_default"},
+            ]},
+        ],
+    }
+    assert plan_indexes(plan) == {"covid19_daily_y2021_key"}
+    assert plan_seq_scans(plan) == {"covid19_daily_default"}
+    assert plan_relations(plan) == {"covid19_daily_y2021", "covid19_daily_default"}
+
+
+@pytest.fixture
+def scoped_db():
+    """DATABASE_URL restreinte à un schéma temporaire, supprimé à la fin."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL non définie")
+    try:
+        admin = psycopg2.connect(url)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL injoignable : {e}")
+    admin.autocommit = True
+    schema = f"test_migrations_{os.getpid()}"
+    with admin.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+    try:
+        yield url + ("&" if "?" in url else "?") + f"options=-csearch_path%3D{schema}"
+    finally:
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+
+# Assez de pays pour qu'une période d'un demi-mois soit sélective : le plan
+# naturel, seul pris en compte par check_plans, passe alors par les index
+# (fichiers rangés par pays, le chargement les insère dans l'ordre des dates)
+COUNTRIES = ["France", "Italy", "Spain"] + [f"Pays {n:02d}" for n in range(20)]
+
+
+def daily_rows(years):
+    dates = pd.date_range(f"{years[0]}-01-01", f"{years[-1]}-12-31", freq="D")
+    return pd.DataFrame([
+        (country, day.date(), i * 10, i, i * 5)
+        for country in COUNTRIES
+        for i, day in enumerate(dates)
+    ], columns=store_data.db_columns)
+
+
+def test_migrate_load_twice_and_check_plans(scoped_db):
+    rows = daily_rows([2020, 2021, 2022])
+    for table in migrations.TABLES:
+        store_data.load_copy(scoped_db, table, iter([rows]))
+    conn = psycopg2.connect(scoped_db)
+    try:
+        with conn, conn.cursor() as cur:
+            # Doublon laissé par un ancien chargement en mode append
+            cur.execute("INSERT INTO covid19_daily (country_region, date, total_cases) "
+                        "VALUES ('France', '2020-01-01', 1)")
+        migrations.migrate(scoped_db, ["brin", "partition"])
+
+        # Une année sans partition : créée au chargement, ligne déjà en DEFAULT reprise
+        with conn, conn.cursor() as cur:
+            cur.execute("INSERT INTO covid19_daily (country_region, date, total_cases) "
+                        "VALUES ('Italy', '2031-06-30', 1)")
+        later = pd.concat([rows, daily_rows([2031])], ignore_index=True)
+        later.loc[0, "total_cases"] = 999
+        for _ in range(2):
+            for table in migrations.TABLES:
+                store_data.load_copy(scoped_db, table, iter([later]))
+
+        with conn, conn.cursor() as cur:
+            for table in migrations.TABLES:
+                cur.execute(f"SELECT count(*), count(DISTINCT (country_region, date)) FROM {table}")
+                total, distinct = cur.fetchone()
+                assert total == distinct == len(later)
+            cur.execute("SELECT total_cases FROM covid19_daily WHERE country_region = 'France' "
+                        "AND date = '2020-01-01'")
+            assert cur.fetchone()[0] == 999
+            cur.execute("SELECT count(*) FROM covid19_daily_default")
+            assert cur.fetchone()[0] == 0
+            cur.execute("SELECT count(*) FROM covid19_daily_y2031")
+            assert cur.fetchone()[0] == len(COUNTRIES) * 365
+    finally:
+        conn.close()
+    assert migrations.check_plans(scoped_db) == 0
@@ -0,0 +1,43 @@
+import sys
+import os
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from api import ml_api
+
+def test_score_matches_predict():
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 20000, size=(200, 2))
+    y = (X[:, 1] > 10000).astype(int)
+    clf = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+    preds, probas = ml_api.score(X, clf)
+    assert preds.tolist() == clf.predict(X).tolist()
+    assert np.allclose(probas, clf.predict_proba(X)[:, 1])
+
+def test_ready_after_reload_following_failed_start(tmp_path, monkeypatch):
+    import joblib
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(ml_api, "handle", None)
+    monkeypatch.setitem(ml_api.startup_state, "status", "starting")
+    monkeypatch.setitem(ml_api.startup_state, "error", None)
+
+    # Démarrage avant la publication d'un modèle
+    def missing():
+        raise FileNotFoundError("aucun modèle publié")
+    monkeypatch.setattr(ml_api, "resolve_model", missing)
+    ml_api.initial_load()
+    client = TestClient(ml_api.app)
+    assert client.get("/ready").status_code == 503
+
+    # Le modèle est publié, le thread de surveillance (ou /admin/reload) le charge
+    clf = RandomForestClassifier(n_estimators=2, random_state=0).fit([[0, 0], [1, 1]], [0, 1])
+    path = str(tmp_path / "model.joblib")
+    joblib.dump(clf, path)
+    monkeypatch.setattr(ml_api, "resolve_model", lambda: (path, "v1", None))
+    ml_api.load_model()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["version"] == "v1" and response.json()["error"] is None
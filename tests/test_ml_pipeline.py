@@ -6,4 +6,44 @@ from ml_pipeline import train_model
 
 def test_train_model():
     assert train_model() is not None
-    
\ No newline at end of file
+
+def test_training_key_tracks_data_and_params():
+    import numpy as np
+    from ml_pipeline import data_fingerprint, training_key
+
+    X = np.arange(20).reshape(10, 2)
+    y = np.array([0, 1] * 5)
+    fingerprint = data_fingerprint(X, y)
+    assert fingerprint == data_fingerprint(X.copy(), y.copy())
+    assert fingerprint != data_fingerprint(X + 1, y)
+    assert training_key(fingerprint, {}) != training_key(fingerprint, {"grid": {"max_depth": [8]}})
+
+def test_stage_report_records_stages(tmp_path):
+    import json
+    from ml_pipeline import StageReport
+
+    report = StageReport()
+    with report.stage("extraction") as st:
+        st["rows"] = 3
+    with report.stage("fit", rows=2):
+        sum(range(1000))
+    path = tmp_path / "timings.json"
+    report.write(str(path), skipped=False)
+
+    data = json.loads(path.read_text())
+    assert [s["name"] for s in data["stages"]] == ["extraction", "fit"]
+    assert data["stages"][0]["rows"] == 3
+    assert all(s["wall_s"] >= 0 and s["max_rss_mb"] > 0 for s in data["stages"])
+    assert data["skipped"] is False
+
+def test_stage_report_without_resource(tmp_path, monkeypatch):
+    import ml_pipeline
+
+    # Windows : pas de module resource
+    monkeypatch.setattr(ml_pipeline, "resource", None)
+    report = ml_pipeline.StageReport()
+    with report.stage("fit", rows=2):
+        pass
+    report.write(str(tmp_path / "timings.json"))
+    assert report.stages[0]["max_rss_mb"] is None
+    assert report.stages[0]["children_cpu_s"] is None
@@ -0,0 +1,24 @@
+import sys
+import os
+
+import joblib
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+import model_registry
+
+def test_publish_moves_pointer_and_prunes(tmp_path):
+    root = str(tmp_path)
+    assert model_registry.current(root) is None
+
+    versions = []
+    for i in range(4):
+        meta = model_registry.publish({"coef": i}, {"f1": 0.5 + i / 10}, root=root, keep=2)
+        versions.append(meta["version"])
+
+    meta = model_registry.current(root)
+    assert meta["version"] == versions[-1] and meta["f1"] == 0.8
+    assert joblib.load(os.path.join(root, meta["file"])) == {"coef": 3}
+    artefacts = sorted(f for f in os.listdir(root) if f.endswith(".joblib"))
+    # Publiées dans la même seconde : ce sont bien les deux dernières qui restent
+    assert artefacts == sorted(f"model_covid_rf-{v}.joblib" for v in versions[-2:])
+    assert not any(".tmp" in f for f in os.listdir(root))
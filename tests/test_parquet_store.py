@@ -0,0 +1,40 @@
+import sys
+import os
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+import parquet_store
+
+def make_df(rows):
+    return pd.DataFrame(rows, columns=parquet_store.parquet_columns)
+
+def test_upsert_replaces_month_and_filters(tmp_path):
+    root = str(tmp_path)
+    parquet_store.write_dataset(make_df([
+        ("France", "2020-12-31", 100, 1, 99),
+        ("France", "2021-01-15", 150, 2, 148),
+        ("Italy",  "2021-01-15", 80, 1, 79),
+    ]), "covid19_daily", root=root)
+
+    # Le mois de janvier de la France reçoit un nouveau dernier jour
+    parquet_store.upsert_dataset(make_df([
+        ("France", "2021-01-31", 200, 3, 197),
+    ]), "covid19_daily", root=root)
+
+    df = parquet_store.read_dataset("covid19_daily", root=root)
+    assert len(df) == 3
+    france = df[df["country_region"] == "France"].sort_values("date")
+    assert france["date"].dt.strftime("%Y-%m-%d").tolist() == ["2020-12-31", "2021-01-31"]
+
+    df = parquet_store.read_dataset("covid19_daily", columns=["country_region", "total_cases"],
+                                    countries=["France"], date_from="2021-01-01", root=root)
+    assert list(df.columns) == ["country_region", "total_cases"]
+    assert df["total_cases"].tolist() == [200]
+
+def test_empty_delta_writes_empty_dataset(tmp_path):
+    root = str(tmp_path)
+    parquet_store.write_dataset(make_df([]), "covid19_daily_delta", root=root)
+    assert parquet_store.exists("covid19_daily_delta", root=root)
+    assert parquet_store.read_dataset("covid19_daily_delta", root=root).empty
+    assert list(parquet_store.iter_chunks("covid19_daily_delta", root=root)) == []
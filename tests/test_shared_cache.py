@@ -0,0 +1,68 @@
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+import pandas as pd
+import shared_cache
+from shared_cache import DiskCache, from_ipc, to_ipc
+
+
+def frame():
+    return pd.DataFrame({
+        "country": ["France", "Italy"],
+        "date": pd.to_datetime(["2021-01-31", "2021-02-28"]),
+        "total_cases": [10, 20],
+    })
+
+
+def test_disk_cache_shared_between_instances(tmp_path):
+    writer, reader = DiskCache(str(tmp_path)), DiskCache(str(tmp_path))
+    key = (("mpox", "3@2024-01-01"), "series", ("France", "Italy"))
+    assert reader.get(key) is None
+    writer.set(key, frame())
+
+    pd.testing.assert_frame_equal(reader.get(key), frame())
+    # Autre version des données : autre entrée
+    assert reader.get((("mpox", "4@2024-01-02"),) + key[1:]) is None
+    assert reader.metrics()["hits"] == 1
+    assert not [f for f in os.listdir(tmp_path) if ".tmp" in f]
+
+
+def test_disk_cache_ttl_and_size_limit(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=-1)
+    cache.set("a", frame())
+    assert cache.get("a") is not None  # ttl <= 0 : pas d'expiration
+
+    size = os.path.getsize(cache.path("a"))
+    cache = DiskCache(str(tmp_path), max_bytes=int(size * 1.5))
+    os.utime(cache.path("a"), (0, 0))  # "a" est la plus ancienne
+    cache.set("b", frame())
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+
+def test_ipc_roundtrip():
+    pd.testing.assert_frame_equal(from_ipc(to_ipc(frame())), frame())
+
+def test_redis_cache_corrupt_value_is_a_miss():
+    class FakeRedis:
+        def __init__(self):
+            self.data = {}
+
+        def get(self, key):
+            return self.data.get(key)
+
+        def set(self, key, value, ex=None):
+            self.data[key] = value
+
+    # Sans le paquet redis : on contourne le constructeur
+    cache = shared_cache.RedisCache.__new__(shared_cache.RedisCache)
+    shared_cache.SharedCache.__init__(cache)
+    cache.client, cache.ttl = FakeRedis(), 60
+
+    cache.set(("k",), pd.DataFrame({"a": [1, 2]}))
+    assert cache.get(("k",))["a"].tolist() == [1, 2]
+    cache.client.data[shared_cache.KEY_PREFIX + shared_cache.digest(("k",))] = b"tronque"
+    assert cache.get(("k",)) is None
+    stats = cache.metrics()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["errors"] == 1